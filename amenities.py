@@ -0,0 +1,103 @@
+import argparse
+import hashlib
+import time
+import duckdb
+import yaml
+import resources
+import storage
+
+# Column prefix in parcel_amenity_distance -> layer it measures to. A layer that isn't loaded leaves its column NULL
+AMENITIES = {'park': 'parks', 'school': 'schools', 'station': 'transit_stops'}
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+def settings(config):
+    return config.get('amenities', {})
+
+def amenities_version(con, config, layers):
+    s = settings(config)
+    hashes = con.execute(f"""
+        SELECT string_agg(table_name || ':' || file_hash, ',' ORDER BY table_name) FROM _manifest
+        WHERE table_name IN ({', '.join(f"'{t}'" for t in ['parcels', *layers])})
+    """).fetchone()[0]
+    return hashlib.sha256(f"{hashes}|{s.get('start_radius_feet', 1320)}|{s.get('max_radius_feet', 21120)}".encode()).hexdigest()[:16]
+
+def nearest(con, name, layer, start, limit):
+    # Expanding search. Each round is one SPATIAL_JOIN, which builds its own R-tree for the query (the layer's RTREE
+    # index plays no part), between the parcels still without an answer and only the features within radius of their
+    # combined extent. Anything found within radius is the true nearest, so the radius doubles only for the parcels left
+    # over, and the later, wider rounds join a shrinking set of parcels
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE _amenity_todo AS
+        SELECT DISTINCT pin10, geom_3435, xmin, ymin, xmax, ymax FROM parcels WHERE geom_3435 IS NOT NULL
+    """)
+    con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _amenity_{name} (pin10 BIGINT, feet DOUBLE)")
+    left = con.execute("SELECT COUNT(*) FROM _amenity_todo").fetchone()[0]
+    radius = float(start)
+    while left:
+        x0, y0, x1, y1 = con.execute("SELECT MIN(xmin), MIN(ymin), MAX(xmax), MAX(ymax) FROM _amenity_todo").fetchone()
+        con.execute(f"""
+            INSERT INTO _amenity_{name}
+            SELECT p.pin10, MIN(ST_Distance(p.geom_3435, a.geom_3435))
+            FROM _amenity_todo p
+            JOIN (
+                SELECT geom_3435 FROM {layer}
+                WHERE geom_3435 IS NOT NULL
+                  AND xmax >= {x0 - radius} AND xmin <= {x1 + radius} AND ymax >= {y0 - radius} AND ymin <= {y1 + radius}
+            ) a ON ST_DWithin(p.geom_3435, a.geom_3435, {radius})
+            GROUP BY 1
+        """)
+        con.execute(f"DELETE FROM _amenity_todo WHERE pin10 IN (SELECT pin10 FROM _amenity_{name})")
+        left = con.execute("SELECT COUNT(*) FROM _amenity_todo").fetchone()[0]
+        if radius >= limit:
+            break
+        radius = min(radius * 2, float(limit))
+    con.execute("DROP TABLE _amenity_todo")
+    return left
+
+def build_amenity_distance(con, config, force=False):
+    s = settings(config)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if 'parcels' not in tables or '_manifest' not in tables:
+        return
+    layers = {name: layer for name, layer in AMENITIES.items() if layer in tables}
+    version = amenities_version(con, config, layers.values())
+    if not force and 'parcel_amenity_distance' in tables and con.execute(
+            "SELECT COUNT(*) FROM parcel_amenity_distance WHERE version = ?", [version]).fetchone()[0]:
+        print(f"   ⏭️  Amenity distances unchanged (version {version})")
+        return
+
+    t0 = time.time()
+    start = s.get('start_radius_feet', 1320)
+    limit = s.get('max_radius_feet', 21120)
+    unreached = {name: nearest(con, name, layer, start, limit) for name, layer in layers.items()}
+    joins = ' '.join(f"LEFT JOIN _amenity_{name} {name} ON p.pin10 = {name}.pin10" for name in layers)
+    columns = ', '.join(f"{name}.feet AS {name}_feet" if name in layers else f"CAST(NULL AS DOUBLE) AS {name}_feet" for name in AMENITIES)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE parcel_amenity_distance AS
+        SELECT p.pin10, {columns}, '{version}' AS version
+        FROM (SELECT DISTINCT pin10 FROM parcels WHERE geom_3435 IS NOT NULL) p
+        {joins}
+        ORDER BY p.pin10
+    """)
+    for name in layers:
+        con.execute(f"DROP TABLE _amenity_{name}")
+    count = con.execute("SELECT COUNT(*) FROM parcel_amenity_distance").fetchone()[0]
+    missing = [layer for layer in AMENITIES.values() if layer not in layers.values()]
+    far = ', '.join(f"{n:,} beyond {limit:,} ft of a {name}" for name, n in unreached.items() if n)
+    print(f"   ✅ Nearest {', '.join(layers)} for {count:,} parcels in {time.time() - t0:.1f}s"
+          + (f" ({far})" if far else "") + (f"; {', '.join(missing)} not loaded" if missing else ""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild parcel_amenity_distance")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if no layer changed")
+    args = parser.parse_args()
+
+    config = load_config()
+    con = duckdb.connect(config['database']['file_name'])
+    storage.load_spatial(con)
+    resources.configure(con, config)
+    build_amenity_distance(con, config, force=args.force)
+    con.close()
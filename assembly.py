@@ -0,0 +1,213 @@
+import hashlib
+import time
+import pandas as pd
+from jinja2 import Template
+
+SCENARIOS = ['true_sb79', 'train_only', 'train_and_hf_bus', 'train_and_bus_combo']
+# Every capacity in 03_pro_forma.sql is capped with LEAST(20, ...)
+MAX_UNITS = 20
+
+def settings(config):
+    return config.get('assembly', {})
+
+def adjacency_version(con, config):
+    s = settings(config)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    parcels = con.execute("SELECT file_hash FROM _manifest WHERE table_name = 'parcels'").fetchone() if '_manifest' in tables else None
+    if not parcels:
+        return None
+    return hashlib.sha256(f"{parcels[0]}|{s.get('tolerance_feet', 5)}|{s.get('min_shared_feet', 10)}".encode()).hexdigest()[:16]
+
+def build_adjacency(con, config):
+    s = settings(config)
+    tolerance = float(s.get('tolerance_feet', 5))
+    min_shared = float(s.get('min_shared_feet', 10))
+    version = adjacency_version(con, config)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if version and 'parcel_adjacency' in tables and con.execute(
+            "SELECT COUNT(*) FROM parcel_adjacency WHERE version = ?", [version]).fetchone()[0]:
+        print(f"⏭️  Parcel adjacency unchanged (version {version})")
+        return
+
+    t0 = time.time()
+    print("⏳ Building parcel adjacency graph...", end="", flush=True)
+    # Each parcel is buffered once and neighbours found by a spatial join on the buffers. The pairs are materialized
+    # before the pin filter and the shared-length measure, which otherwise push the planner off the spatial join
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _adjacency_buffers AS
+        SELECT pin10, ST_Buffer(geom_3435, {tolerance}) AS geom FROM parcels WHERE geom_3435 IS NOT NULL
+    """)
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE _adjacency_pairs AS
+        SELECT a.pin10 AS pin_a, b.pin10 AS pin_b
+        FROM parcels a JOIN _adjacency_buffers b ON ST_Intersects(a.geom_3435, b.geom)
+    """)
+    # Only boundaries shared for at least min_shared_feet count, so lots meeting at a corner aren't neighbours
+    con.execute(f"""
+        CREATE OR REPLACE TABLE parcel_adjacency AS
+        SELECT pin_a, pin_b, MAX(shared_feet) AS shared_feet, '{version or 'unversioned'}' AS version
+        FROM (
+            SELECT p.pin_a, p.pin_b, ST_Length(ST_Intersection(ST_Boundary(a.geom_3435), b.geom)) AS shared_feet
+            FROM _adjacency_pairs p
+            JOIN parcels a ON p.pin_a = a.pin10
+            JOIN _adjacency_buffers b ON p.pin_b = b.pin10
+            WHERE p.pin_a < p.pin_b
+        )
+        GROUP BY 1, 2
+        HAVING MAX(shared_feet) >= {min_shared}
+    """)
+    con.execute("DROP TABLE _adjacency_pairs")
+    con.execute("DROP TABLE _adjacency_buffers")
+    pairs = con.execute("SELECT COUNT(*) FROM parcel_adjacency").fetchone()[0]
+    print(f" ✅ ({pairs:,} neighbouring pairs in {time.time() - t0:.1f}s)")
+
+def connected_components(a, b):
+    # Union-find; each component is labelled with its smallest prop_id
+    parent = {}
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+    for x, y in zip(a, b):
+        rx, ry = find(x), find(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+    nodes = sorted(set(a) | set(b))
+    return pd.DataFrame({'prop_id': nodes, 'component_id': [find(x) for x in nodes]})
+
+def bounded(sets, max_area):
+    # Growing a combination only adds area and existing yield, so one over the area limit or whose members already
+    # reach the per-building unit cap (where no assembly can add units in any scenario) is dropped with all its supersets
+    return f"""
+        SELECT s.members, SUM(n.area_sqft) AS area_sqft, SUM(n.units) AS units
+        FROM (SELECT members, UNNEST(members) AS prop_id FROM ({sets})) s
+        JOIN _assembly_nodes n ON s.prop_id = n.prop_id
+        GROUP BY s.members
+        HAVING SUM(n.area_sqft) <= {max_area} AND SUM(n.units) < {MAX_UNITS}
+    """
+
+def run_assembly(con, config):
+    s = settings(config)
+    if not s.get('enabled', True):
+        return
+    build_adjacency(con, config)
+
+    t0 = time.time()
+    print("⏳ Searching adjacent lot assemblies...", end="", flush=True)
+    max_parcels = int(s.get('max_parcels', 4))
+    max_area = float(s.get('max_area_sqft', 43560))
+    min_shared = float(s.get('min_shared_feet', 10))
+    scenario = s.get('scenario', 'true_sb79')
+
+    # Only properties that pass every filter but lot size and density can be assembled; those two are judged on the
+    # combined lot. Members must share a zone so the combined lot's capacity rules are unambiguous
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _assembly_nodes AS
+        SELECT prop_id, zone_class, area_sqft, LEAST({', '.join(f'tot_{sc}' for sc in SCENARIOS)}) AS units
+        FROM step5_pro_forma
+        WHERE pass_max_units AND pass_age_value AND pass_zoning_class AND pass_prop_class AND pass_min_value
+          AND area_sqft < {max_area}
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _assembly_edges AS
+        WITH e AS (
+            SELECT DISTINCT LEAST(pa.prop_id, pb.prop_id) AS a, GREATEST(pa.prop_id, pb.prop_id) AS b
+            FROM parcel_adjacency adj
+            JOIN property_parcels pa ON adj.pin_a = pa.pin10
+            JOIN property_parcels pb ON adj.pin_b = pb.pin10
+            WHERE pa.prop_id != pb.prop_id AND adj.shared_feet >= {min_shared}
+        )
+        SELECT e.a, e.b
+        FROM e
+        JOIN _assembly_nodes na ON e.a = na.prop_id
+        JOIN _assembly_nodes nb ON e.b = nb.prop_id
+        WHERE na.zone_class = nb.zone_class
+    """)
+    edges = con.execute("SELECT a, b FROM _assembly_edges").fetchnumpy()
+    components = connected_components(edges['a'].tolist(), edges['b'].tolist())
+    con.register('_assembly_component_frame', components)
+    con.execute("CREATE OR REPLACE TEMPORARY TABLE _assembly_components AS SELECT * FROM _assembly_component_frame")
+    con.unregister('_assembly_component_frame')
+
+    # Connected combinations of 2..max_parcels properties, grown one neighbour at a time and deduplicated by member set
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE _assembly_links AS
+        SELECT a AS prop_id, b AS other FROM _assembly_edges UNION ALL SELECT b, a FROM _assembly_edges
+    """)
+    con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _assembly_frontier AS {bounded('SELECT [a, b] AS members FROM _assembly_edges', max_area)}")
+    con.execute("CREATE OR REPLACE TEMPORARY TABLE _assembly_all AS SELECT members FROM _assembly_frontier")
+    for _ in range(3, max_parcels + 1):
+        grown = """
+            SELECT DISTINCT list_sort(list_append(f.members, l.other)) AS members
+            FROM (SELECT members, UNNEST(members) AS prop_id FROM _assembly_frontier) f
+            JOIN _assembly_links l ON f.prop_id = l.prop_id
+            WHERE NOT list_contains(f.members, l.other)
+        """
+        con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _assembly_next AS {bounded(grown, max_area)}")
+        con.execute("DROP TABLE _assembly_frontier")
+        con.execute("ALTER TABLE _assembly_next RENAME TO _assembly_frontier")
+        con.execute("INSERT INTO _assembly_all SELECT members FROM _assembly_frontier")
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE _assembly_sets AS
+        SELECT row_number() OVER (ORDER BY s.members) AS candidate_id, s.members, c.component_id
+        FROM _assembly_all s
+        JOIN _assembly_components c ON s.members[1] = c.prop_id
+    """)
+
+    # Each combination goes through the same pro forma as a single property, and is credited with the units it adds
+    # over its members developed separately
+    with open('sql/03b_assembly_candidates.sql', 'r') as f:
+        con.execute(f.read())
+    with open('sql/03_pro_forma.sql', 'r') as f:
+        template = Template(f.read())
+    con.execute(template.render(source_table='assembly_candidates', target_table='assembly_pro_forma', **config['economic_assumptions']))
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _assembly_gains AS
+        WITH member_totals AS (
+            SELECT c.prop_id AS candidate_id, {', '.join(f'SUM(p.tot_{sc}) AS tot_{sc}' for sc in SCENARIOS)}
+            FROM (SELECT prop_id, UNNEST(members) AS member FROM assembly_candidates) c
+            JOIN step5_pro_forma p ON c.member = p.prop_id
+            GROUP BY 1
+        )
+        SELECT a.prop_id AS candidate_id, c.members,
+               {', '.join(f'm.tot_{sc} AS members_{sc}, a.tot_{sc} - m.tot_{sc} AS extra_{sc}' for sc in SCENARIOS)}
+        FROM assembly_pro_forma a
+        JOIN assembly_candidates c ON a.prop_id = c.prop_id
+        JOIN member_totals m ON a.prop_id = m.candidate_id
+    """)
+
+    # Greedy pick of non-overlapping assemblies, largest gain first and fewer parcels on ties; a property is sold once
+    rows = con.execute(f"""
+        SELECT candidate_id, members FROM _assembly_gains WHERE extra_{scenario} > 0
+        ORDER BY extra_{scenario} DESC, len(members), candidate_id
+    """).fetchall()
+    used, chosen = set(), []
+    for candidate_id, members in rows:
+        if used.isdisjoint(members):
+            used.update(members)
+            chosen.append(candidate_id)
+    con.register('_assembly_chosen', pd.DataFrame({'candidate_id': pd.Series(chosen, dtype='int64')}))
+    con.execute(f"""
+        CREATE OR REPLACE TABLE assembly_results AS
+        SELECT g.candidate_id AS assembly_id, c.component_id, g.members, a.parcels_combined, a.area_sqft, a.zone_class,
+               a.neighborhood_name, a.prop_address, a.center_geom,
+               {', '.join(f'g.members_{sc}, a.tot_{sc}, g.extra_{sc}' for sc in SCENARIOS)}
+        FROM _assembly_gains g
+        JOIN _assembly_chosen x ON g.candidate_id = x.candidate_id
+        JOIN assembly_candidates c ON g.candidate_id = c.prop_id
+        JOIN assembly_pro_forma a ON g.candidate_id = a.prop_id
+        ORDER BY g.extra_{scenario} DESC, g.candidate_id
+    """)
+    con.unregister('_assembly_chosen')
+
+    candidates = con.execute("SELECT COUNT(*) FROM _assembly_sets").fetchone()[0]
+    extra = con.execute(f"SELECT COALESCE(SUM(extra_{scenario}), 0) FROM assembly_results").fetchone()[0]
+    for table in ['assembly_pro_forma', 'assembly_candidates', '_assembly_gains', '_assembly_sets', '_assembly_all',
+                  '_assembly_frontier', '_assembly_links', '_assembly_components', '_assembly_edges', '_assembly_nodes']:
+        con.execute(f"DROP TABLE {table}")
+    print(f" ✅ ({time.time() - t0:.1f}s)")
+    print(f"   🧩 {candidates:,} combinations of 2-{max_parcels} neighbouring properties in {len(components['component_id'].unique()):,} groups; "
+          f"{len(chosen):,} non-overlapping assemblies add {int(extra):,} units ({scenario})")
@@ -0,0 +1,153 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import duckdb
+import yaml
+import manifest
+import storage
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+def bundle_files(config):
+    # Converted inputs let a later setup run skip conversion; generate_map.py still reads the raw neighborhoods
+    files = ['config.yaml']
+    files += sorted(glob.glob(os.path.join(config.get('storage', {}).get('parquet_dir', 'data/parquet'), '**', '*.parquet'), recursive=True))
+    files += [config['files'][key] for key in storage.RAW_REQUIRED if os.path.exists(config['files'][key])]
+    return files
+
+def write_checksums(root):
+    lines = []
+    for dirpath, _, names in os.walk(root):
+        for name in sorted(names):
+            path = os.path.join(dirpath, name)
+            lines.append(f"{manifest.file_hash([path])}  {os.path.relpath(path, root)}")
+    with open(os.path.join(root, 'SHA256SUMS'), 'w') as f:
+        f.write('\n'.join(sorted(lines, key=lambda l: l[66:])) + '\n')
+
+def verify_checksums(root):
+    with open(os.path.join(root, 'SHA256SUMS')) as f:
+        for line in f:
+            digest, path = line.rstrip('\n').split('  ', 1)
+            if manifest.file_hash([os.path.join(root, path)]) != digest:
+                raise ValueError(f"checksum mismatch for {path}")
+
+def bundle(config, out):
+    print(f"\n📦 Bundling database and inputs into {out}...")
+    t0 = time.time()
+    db_file = config['database']['file_name']
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'sb79_bundle')
+        os.makedirs(os.path.join(root, 'files'))
+
+        con = duckdb.connect(db_file, read_only=True)
+        storage.load_spatial(con)
+        con.execute(f"EXPORT DATABASE '{os.path.join(root, 'db')}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+        extension = con.execute("SELECT install_path FROM duckdb_extensions() WHERE extension_name = 'spatial'").fetchone()[0]
+        platform = con.execute("PRAGMA platform").fetchone()[0]
+        con.close()
+        shutil.copy2(extension, os.path.join(root, 'spatial.duckdb_extension'))
+
+        for path in bundle_files(config):
+            dest = os.path.join(root, 'files', path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(path, dest)
+
+        with open(os.path.join(root, 'bundle.json'), 'w') as f:
+            json.dump({'duckdb_version': duckdb.__version__, 'platform': platform, 'database': db_file,
+                       'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+        write_checksums(root)
+
+        os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+        with tarfile.open(out + '.tmp', 'w:gz', compresslevel=1) as tar:
+            tar.add(root, arcname='sb79_bundle')
+        os.replace(out + '.tmp', out)
+    print(f"✅ Wrote {out} ({os.path.getsize(out) / 1e6:,.1f} MB in {time.time() - t0:.1f}s, DuckDB {duckdb.__version__} {platform}).")
+
+def extract(tar, path):
+    # The 'data' filter (Python 3.12, and 3.8.17 / 3.9.17 / 3.10.12 / 3.11.4 onwards) refuses links, devices and paths
+    # outside path. Older Pythons get the same checks here; a bundle only ever holds regular files and directories
+    if hasattr(tarfile, 'data_filter'):
+        tar.extractall(path, filter='data')
+        return
+    root = os.path.realpath(path)
+    for member in tar.getmembers():
+        target = os.path.realpath(os.path.join(root, member.name))
+        if not (member.isfile() or member.isdir()) or os.path.commonpath([root, target]) != root:
+            raise ValueError(f"unexpected member {member.name}")
+    tar.extractall(path)
+
+def restore(config, archive, force=False, overwrite_config=False):
+    print(f"\n📦 Restoring {archive}...")
+    t0 = time.time()
+    db_file = config['database']['file_name']
+    if os.path.exists(db_file) and not force:
+        print(f"❌ {db_file} already exists. Pass --force to replace it.")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'sb79_bundle')
+        try:
+            with tarfile.open(archive, 'r:*') as tar:
+                extract(tar, tmp)
+            verify_checksums(root)
+        except (OSError, ValueError, tarfile.TarError) as e:
+            print(f"❌ Bundle is corrupt: {e}")
+            return False
+
+        with open(os.path.join(root, 'bundle.json')) as f:
+            info = json.load(f)
+        con = duckdb.connect()
+        platform = con.execute("PRAGMA platform").fetchone()[0]
+        # Extension binaries only load into the DuckDB build they were compiled for
+        if (info['duckdb_version'], info['platform']) != (duckdb.__version__, platform):
+            print(f"❌ Bundle was built with DuckDB {info['duckdb_version']} on {info['platform']}; this is {duckdb.__version__} on {platform}.")
+            return False
+        con.execute(f"FORCE INSTALL '{os.path.join(root, 'spatial.duckdb_extension')}'")
+        con.close()
+
+        # The local config.yaml (paths, resources, credentials) is kept unless asked for; the bundle's goes beside it
+        files_root = os.path.join(root, 'files')
+        for dirpath, _, names in os.walk(files_root):
+            for name in names:
+                src = os.path.join(dirpath, name)
+                dest = os.path.relpath(src, files_root)
+                if dest == 'config.yaml' and not overwrite_config:
+                    dest = 'config.bundle.yaml'
+                    print(f"   📝 Bundle's config written to {dest}; pass --overwrite-config to replace config.yaml")
+                os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+                shutil.copy2(src, dest)
+
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        con = duckdb.connect(db_file)
+        storage.load_spatial(con)
+        con.execute(f"IMPORT DATABASE '{os.path.join(root, 'db')}'")
+        tables = con.execute("SELECT COUNT(*) FROM duckdb_tables()").fetchone()[0]
+        con.close()
+    print(f"✅ Restored {tables} tables into {db_file} in {time.time() - t0:.1f}s.")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Package the prepared database for an offline machine, or restore one")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bundle = sub.add_parser('bundle', help="Export the database, converted inputs and the spatial extension into one archive")
+    p_bundle.add_argument('--out', default='data/sb79_bundle.tar.gz')
+    p_restore = sub.add_parser('restore', help="Install the bundled spatial extension and import the database without network access")
+    p_restore.add_argument('archive')
+    p_restore.add_argument('--force', action='store_true', help="Replace an existing database file")
+    p_restore.add_argument('--overwrite-config', action='store_true', help="Replace config.yaml with the bundle's instead of writing config.bundle.yaml")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.command == 'bundle':
+        bundle(config, args.out)
+    elif restore(config, args.archive, args.force, args.overwrite_config):
+        print("\n🚀 Ready! Now run: python3 sandbox.py")
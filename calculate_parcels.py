@@ -1,5 +1,13 @@
+import hashlib
 import duckdb
 import yaml
+import assembly
+import envelopes
+import gtfs
+import resources
+import spatial_engine
+import storage
+import walk_network
 import time
 from jinja2 import Template
 
@@ -7,51 +15,106 @@ def load_config():
     with open('config.yaml', 'r') as f:
         return yaml.safe_load(f)
 
-def run_parcel_calculations(full_recalculate=True, is_sandbox=False):
+def build_transit_buffers(con, config):
+    radius = int(config.get('transit', {'max_radius_feet': 2640})['max_radius_feet'])
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    hashes = con.execute("""
+        SELECT string_agg(table_name || ':' || file_hash, ',' ORDER BY table_name) FROM _manifest
+        WHERE table_name IN ('transit_stops', 'bus_routes')
+    """).fetchone()[0] if '_manifest' in tables else None
+    version = hashlib.sha256(f"{hashes}|{radius}".encode()).hexdigest()[:16] if hashes else None
+
+    if version and 'transit_buffers' in tables and con.execute(
+            "SELECT COUNT(*) FROM transit_buffers WHERE version = ?", [version]).fetchone()[0]:
+        print(f"⏭️  Transit buffers unchanged (version {version})")
+        return
+    t0 = time.time()
+    print("⏳ Building dissolved transit buffers...", end="", flush=True)
+    with open('sql/01a_transit_buffers.sql', 'r') as f:
+        template = Template(f.read())
+    con.execute(template.render(radius=radius, version=version or 'unversioned'))
+    print(f" ✅ ({time.time() - t0:.1f}s)")
+
+def run_parcel_calculations(full_recalculate=True, is_sandbox=False, incremental=False):
     config = load_config()
     db_file = config['database']['file_name']
 
     con = duckdb.connect(db_file)
-    con.execute("INSTALL spatial; LOAD spatial;")
+    storage.load_spatial(con)
+    resources.configure(con, config)
     con.execute("PRAGMA enable_progress_bar;")
+    # Per-stage time and peak memory, printed at the end
+    report = []
 
     if full_recalculate:
-        print("\n🚀 Running Full Spatial Analysis...")
+        print("\n🚀 Refreshing Spatial Analysis from layer changes..." if incremental else "\n🚀 Running Full Spatial Analysis...")
 
-        t0 = time.time()
+        t0 = resources.start()
+        gtfs.ensure_hf_routes(con, config)
+        build_transit_buffers(con, config)
+        walk_network.setup_walk_network(con, config)
+        resources.finish(report, "Transit routes, buffers and walk network", t0)
+        t0 = resources.start()
         print("⏳ [1/5] Isolating parcels and calculating spatial intersections...", end="", flush=True)
-        with open('sql/01_spatial_joins.sql', 'r') as f:
-            template = Template(f.read())
-        con.execute(template.render(is_sandbox=is_sandbox, files=config['files']))
-        print(f" ✅ ({time.time() - t0:.1f}s)")
+        # Tiles run in worker processes that attach the database read-only, so release it meanwhile
+        con.close()
+        delta = None
+        if incremental:
+            tiles, delta = spatial_engine.refresh_spatial_base(config, is_sandbox=is_sandbox)
+        else:
+            tiles = spatial_engine.build_spatial_base(config, is_sandbox=is_sandbox)
+        spatial_seconds = resources.finish(report, "[1/5] Spatial joins", t0, tiles)
+        t1 = resources.start()
+        envelope = envelopes.build_envelopes(config)
+        envelope_seconds = resources.finish(report, "Lot shape and setback envelopes", t1, envelope['tiles'])
+        con = duckdb.connect(db_file)
+        storage.load_spatial(con)
+        resources.configure(con, config)
+        print(f" ✅ ({spatial_seconds + envelope_seconds:.1f}s, {len(tiles)} tiles)")
+        if delta:
+            layers = ', '.join(f"{n} {layer}" for layer, n in sorted(delta['features'].items())) or 'none'
+            print(f"   🔁 Changed features: {layers}; recomputed {delta['parcels']:,} parcels in place")
+        elif incremental:
+            print("   ⚠️  No previous build with these settings to diff against; ran a full rebuild")
+        boundary, removed = con.execute("""
+            SELECT COUNT(CASE WHEN neighborhood_method = 'area' OR zone_method = 'area' THEN 1 END),
+                   SUM(GREATEST(neighborhood_candidates * zone_candidates - 1, 0))
+            FROM parcel_assignment
+        """).fetchone()
+        print(f"   ✂️  {boundary or 0:,} boundary parcels assigned by overlap area; {int(removed or 0):,} duplicate neighborhood/zone rows removed")
+        print(f"   📐 Measured lot shape and setback envelope for {envelope['parcels']:,} new or changed parcels ({envelope_seconds:.1f}s)")
 
-        t0 = time.time()
+        t0 = resources.start()
         print("⏳ [2/5] Calculating dynamic property values and sales multipliers...", end="", flush=True)
         with open('sql/02_calculate_sales_ratios.sql', 'r') as f:
             con.execute(f.read())
-        print(f" ✅ ({time.time() - t0:.1f}s)")
+        print(f" ✅ ({resources.finish(report, '[2/5] Property values and sales ratios', t0):.1f}s)")
 
-        t0 = time.time()
+        t0 = resources.start()
         print("⏳ [3/5] Calculating dynamic new-build condo prices...", end="", flush=True)
         with open('sql/02b_calculate_condo_values.sql', 'r') as f:
             template = Template(f.read())
         con.execute(template.render(**config['economic_assumptions']))
-        print(f" ✅ ({time.time() - t0:.1f}s)")
+        print(f" ✅ ({resources.finish(report, '[3/5] Condo prices', t0):.1f}s)")
 
     else:
         print("\n🚀 Skipping spatial rebuild, applying financial filters...")
 
-    t0 = time.time()
+    t0 = resources.start()
     print("⏳ [4/5] Executing Real Estate Pro Forma...", end="", flush=True)
     with open('sql/03_pro_forma.sql', 'r') as f:
         template = Template(f.read())
-    con.execute(template.render(**config['economic_assumptions']))
-    print(f" ✅ ({time.time() - t0:.1f}s)")
+    con.execute(template.render(source_table='unified_properties', target_table='step5_pro_forma', **config['economic_assumptions']))
+    print(f" ✅ ({resources.finish(report, '[4/5] Pro forma', t0):.1f}s)")
+    t0 = resources.start()
+    assembly.run_assembly(con, config)
+    resources.finish(report, "Lot assembly", t0)
 
-    t0 = time.time()
+    t0 = resources.start()
     print("⏳ [5/5] Aggregating Neighborhood Results...", end="", flush=True)
     with open('sql/04_aggregate_results.sql', 'r') as f:
         con.execute(f.read())
-    print(f" ✅ ({time.time() - t0:.1f}s)")
+    print(f" ✅ ({resources.finish(report, '[5/5] Neighborhood and station results', t0):.1f}s)")
 
     con.close()
+    resources.print_report(report)
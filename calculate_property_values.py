@@ -6,14 +6,14 @@ def build_property_values(db_file="sb79_housing.duckdb"):
     con.execute("""
     CREATE OR REPLACE TABLE property_values_base AS
     WITH u_agg AS (
-        SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, 
+        SELECT pin10, 
                ANY_VALUE(CAST("class" AS VARCHAR)) as property_class,
                COUNT(pin) as tax_pin_count
         FROM assessor_universe GROUP BY 1
     ),
-    v_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value, SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value FROM assessed_values GROUP BY 1),
-    rc_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, MAX(TRY_CAST(char_yrblt AS INT)) as char_yrblt, SUM(TRY_CAST(char_bldg_sf AS DOUBLE)) as char_bldg_sf FROM res_characteristics GROUP BY 1),
-    pa_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, ANY_VALUE(CAST(prop_address_full AS VARCHAR)) as prop_address FROM parcel_addresses GROUP BY 1),
+    v_agg AS (SELECT pin10, SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value, SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value FROM assessed_values GROUP BY 1),
+    rc_agg AS (SELECT pin10, MAX(TRY_CAST(char_yrblt AS INT)) as char_yrblt, SUM(TRY_CAST(char_bldg_sf AS DOUBLE)) as char_bldg_sf FROM res_characteristics GROUP BY 1),
+    pa_agg AS (SELECT pin10, ANY_VALUE(CAST(prop_address_full AS VARCHAR)) as prop_address FROM parcel_addresses GROUP BY 1),
     
     assessor_joined AS (
         SELECT 
@@ -44,7 +44,7 @@ def build_property_values(db_file="sb79_housing.duckdb"):
     ),
     
     clean_sales AS (
-        SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, 
+        SELECT pin10, 
                TRY_CAST(sale_price AS DOUBLE) as sale_price
         FROM parcel_sales
         WHERE TRY_CAST(sale_price AS DOUBLE) > 20000 
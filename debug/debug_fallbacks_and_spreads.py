@@ -23,7 +23,7 @@ def run_redevelopment_audit():
          FROM parcel_sales s
          LEFT JOIN flat_chars f ON s.pin = f.pin
          LEFT JOIN condo_chars c ON s.pin = c.pin
-         JOIN spatial_base sb ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+         JOIN spatial_base sb ON s.pin10 = sb.pin10
          WHERE sb.neighborhood_name = d.neighborhood_name
            AND s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
            AND s.class IN ('211', '212', '299')
@@ -57,7 +57,7 @@ def run_redevelopment_audit():
         FROM parcel_sales s
         LEFT JOIN flat_chars f ON s.pin = f.pin
         LEFT JOIN condo_chars c ON s.pin = c.pin
-        JOIN spatial_base sb ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+        JOIN spatial_base sb ON s.pin10 = sb.pin10
         WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
           AND s.class IN ('211', '212', '299')
           AND TRY_CAST(s.sale_price AS DOUBLE) > 50000
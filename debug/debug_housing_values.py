@@ -14,7 +14,7 @@ def run_redevelopment_audit():
         neighborhood_name,
         ROUND(condo_price_per_sqft, 2) as ppsf,
         (SELECT COUNT(*) FROM parcel_sales s
-         JOIN spatial_base sb ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+         JOIN spatial_base sb ON s.pin10 = sb.pin10
          WHERE sb.neighborhood_name = d.neighborhood_name
          AND s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR) as recent_sales_volume
     FROM dynamic_condo_values d
@@ -36,7 +36,7 @@ def run_redevelopment_audit():
         FROM parcel_sales s
         LEFT JOIN condo_characteristics cc ON s.pin = cc.pin
         LEFT JOIN res_characteristics u ON s.pin = u.pin
-        JOIN spatial_base sb ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+        JOIN spatial_base sb ON s.pin10 = sb.pin10
         WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
           AND s.class IN ('211', '212', '299')
         GROUP BY 1, 2
@@ -24,7 +24,7 @@ def analyze_new_builds():
             COUNT(DISTINCT rc.pin) AS sfhs
         FROM res_characteristics rc
         JOIN spatial_mapping sm
-          ON SUBSTR(REPLACE(CAST(rc.pin AS VARCHAR), '-', ''), 1, 10) = sm.pin10
+          ON rc.pin10 = sm.pin10
         WHERE TRY_CAST(rc.char_yrblt AS INT) >= 2018
           AND CAST(rc.class AS VARCHAR) IN ('202', '203', '204', '205', '206', '207', '208', '209', '210', '234', '278')
         GROUP BY sm.neighborhood_name
@@ -35,14 +35,14 @@ def analyze_new_builds():
             COUNT(DISTINCT cc.pin) AS condos
         FROM condo_characteristics cc
         JOIN spatial_mapping sm
-          ON SUBSTR(REPLACE(CAST(cc.pin AS VARCHAR), '-', ''), 1, 10) = sm.pin10
+          ON cc.pin10 = sm.pin10
         WHERE TRY_CAST(cc.year_built AS INT) >= 2018
         GROUP BY sm.neighborhood_name
     ),
     mf_base AS (
         -- Get the base property class and total sqft for multi-family buildings
         SELECT
-            SUBSTR(REPLACE(CAST(v.pin AS VARCHAR), '-', ''), 1, 10) AS pin10,
+            v.pin10 AS pin10,
             ANY_VALUE(CAST(v.class AS VARCHAR)) AS property_class,
             SUM(TRY_CAST(rc.char_bldg_sf AS DOUBLE)) AS char_bldg_sf,
             COUNT(v.pin) AS tax_pin_count
@@ -20,7 +20,7 @@ def run_feasibility_debug():
         FROM parcel_sales s
         LEFT JOIN condo_characteristics cc ON s.pin = cc.pin
         LEFT JOIN res_characteristics u ON s.pin = u.pin
-        JOIN spatial_base sb ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+        JOIN spatial_base sb ON s.pin10 = sb.pin10
         WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
         GROUP BY 1
     )
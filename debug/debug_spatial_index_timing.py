@@ -0,0 +1,76 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import duckdb
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import spatial_engine
+import storage
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+def index_tables(con):
+    return [r[0] for r in con.execute("SELECT table_name FROM duckdb_indexes() WHERE index_name LIKE '%_rtree'").fetchall()]
+
+def window_plans(con, config):
+    # The operator the first tile's parcel window actually runs on, to confirm the probe reaches the index
+    tile_size = float(config.get('spatial_engine', {}).get('tile_size_feet', 10000))
+    tile = spatial_engine.list_tiles(con, tile_size)[0]
+    x0, y0 = tile[0] * tile_size, tile[1] * tile_size
+    query = spatial_engine.window('parcels', x0, y0, x0 + tile_size, y0 + tile_size).replace('src.main.', '')
+    plan = con.execute(f"EXPLAIN {query}").fetchall()[0][1]
+    return 'RTREE_INDEX_SCAN' if 'RTREE_INDEX_SCAN' in plan else 'SEQ_SCAN'
+
+def time_spatial_stage(config):
+    t0 = time.time()
+    results = spatial_engine.build_spatial_base(config)
+    return time.time() - t0, sum(r['rows'] for r in results)
+
+def run_index_timing():
+    config = load_config()
+    db_file = config['database']['file_name']
+
+    # Everything runs against a scratch copy: the indexes are dropped part way, and an interrupted run must not
+    # leave the real database without them
+    scratch = tempfile.mkdtemp(prefix='sb79_index_timing_')
+    copy = os.path.join(scratch, os.path.basename(db_file))
+    shutil.copy(db_file, copy)
+    config['database']['file_name'] = copy
+    config.setdefault('spatial_engine', {})['tile_dir'] = os.path.join(scratch, 'tiles')
+    config.setdefault('resources', {})['temp_directory'] = os.path.join(scratch, 'tmp')
+
+    try:
+        print("\n" + "="*80)
+        print("SPATIAL STAGE: RTREE TILE WINDOWS VS SEQUENTIAL SCANS")
+        print("="*80)
+
+        con = duckdb.connect(copy)
+        storage.load_spatial(con)
+        indexed = index_tables(con)
+        with_plan = window_plans(con, config)
+        con.close()
+        with_seconds, rows = time_spatial_stage(config)
+
+        con = duckdb.connect(copy)
+        storage.load_spatial(con)
+        for table in indexed:
+            con.execute(f"DROP INDEX {table}_geom_3435_rtree")
+        without_plan = window_plans(con, config)
+        con.close()
+        without_seconds, _ = time_spatial_stage(config)
+
+        print(f"Indexed tables: {', '.join(sorted(indexed))}")
+        print(f"{'':<16}{'Window scan':>20}{'Spatial stage':>16}")
+        print(f"{'R-tree':<16}{with_plan:>20}{with_seconds:>15.1f}s")
+        print(f"{'No index':<16}{without_plan:>20}{without_seconds:>15.1f}s")
+        print(f"Speedup {without_seconds / max(with_seconds, 1e-6):.2f}x over {rows:,} spatial_base rows")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    run_index_timing()
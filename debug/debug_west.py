@@ -147,7 +147,7 @@ def run_west_elsdon_debug():
         ROUND(rns.sale_price / rns.sqft, 2) as ppsf,
         CAST(rns.sale_date AS DATE) as sale_date
     FROM recent_new_sales rns
-    JOIN (SELECT DISTINCT pin10, neighborhood_name FROM spatial_base) sb ON SUBSTR(REPLACE(CAST(rns.pin AS VARCHAR), '-', ''), 1, 10) = sb.pin10
+    JOIN (SELECT DISTINCT pin10, neighborhood_name FROM spatial_base) sb ON rns.pin10 = sb.pin10
     LEFT JOIN (SELECT pin, ANY_VALUE(prop_address_full) as prop_address_full FROM parcel_addresses GROUP BY pin) pa ON rns.pin = pa.pin
     WHERE sb.neighborhood_name = 'WEST ELSDON'
     ORDER BY ppsf DESC
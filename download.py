@@ -1,70 +1,236 @@
+import argparse
+import glob
 import os
+import random
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import duckdb
 import yaml
+import amenities
+import geography
+import gtfs
+import manifest
+import resources
+import socrata
+import storage
+import sync
 
 def load_config():
     with open('config.yaml', 'r') as f:
         return yaml.safe_load(f)
 
-def download_file(filename, url):
-    if os.path.exists(filename) and os.path.getsize(filename) > 50000:
-        print(f"✅ {filename} exists. Skipping.")
-        return
+class DownloadError(Exception):
+    pass
 
-    print(f"⬇️  Downloading {filename}...")
+def is_complete(filename):
+    # Written after the .part file is renamed into place, holding the size it had then
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (DataProject; python-requests)'}
-        r = requests.get(url, headers=headers, stream=True, timeout=60)
-        r.raise_for_status()
-        with open(filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print(f"✅ Successfully saved {filename}.")
-    except Exception as e:
-        print(f"❌ Failed to download {filename}: {e}")
-
-def setup_database(config):
+        with open(filename + '.complete') as f:
+            return int(f.read()) == os.path.getsize(filename)
+    except (OSError, ValueError):
+        return False
+
+def download_file(filename, url, settings=None):
+    settings = settings or {}
+    retries = settings.get('retries', 5)
+    backoff = settings.get('backoff_seconds', 2.0)
+    chunk_size = settings.get('chunk_size', 1024 * 1024)
+    timeout = settings.get('timeout', 60)
+
+    part = filename + '.part'
+    if os.path.exists(filename):
+        if is_complete(filename):
+            print(f"✅ {filename} exists. Skipping.")
+            return {'file': filename, 'bytes': 0, 'seconds': 0.0, 'skipped': True}
+        # No completion marker: left by the old downloader, which wrote straight to the file, or changed since. It is
+        # checked by resuming from its end; the server answers 416 if it was whole, sends the rest if it was truncated
+        if os.path.exists(part):
+            os.remove(filename)
+        else:
+            os.replace(filename, part)
+        print(f"🔎 {filename} has no completion marker, checking it against the server...")
+
+    headers = {'User-Agent': 'Mozilla/5.0 (DataProject; python-requests)'}
+    t0 = time.time()
+    fetched = 0
+    etag = None
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        request_headers = dict(headers)
+        if offset:
+            request_headers['Range'] = f"bytes={offset}-"
+        try:
+            with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as r:
+                if r.status_code == 416 and offset:
+                    # Range past the end: the .part already holds the whole body
+                    total = r.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total.isdigit() and int(total) == offset:
+                        break
+                    os.remove(part)
+                    raise DownloadError("stale partial file")
+                if r.status_code != 429 and 400 <= r.status_code < 500:
+                    r.raise_for_status()
+                if r.status_code >= 500 or r.status_code == 429:
+                    raise DownloadError(f"HTTP {r.status_code}")
+
+                if r.status_code == 206:
+                    mode = 'ab'
+                else:
+                    # Server ignored the Range header, start over
+                    mode, offset = 'wb', 0
+                etag = r.headers.get('ETag', etag)
+                length = r.headers.get('Content-Length')
+                expected = offset + int(length) if length and length.isdigit() else None
+
+                if offset:
+                    print(f"↩️  Resuming {filename} at {offset / 1e6:,.1f} MB...")
+                else:
+                    print(f"⬇️  Downloading {filename}...")
+                with open(part, mode) as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        fetched += len(chunk)
+
+            size = os.path.getsize(part)
+            if expected is not None and size != expected:
+                raise DownloadError(f"truncated at {size:,} of {expected:,} bytes")
+            break
+        except requests.HTTPError as e:
+            print(f"❌ Failed to download {filename}: {e}")
+            return {'file': filename, 'bytes': fetched, 'seconds': time.time() - t0, 'error': str(e)}
+        except (requests.RequestException, DownloadError) as e:
+            if attempt == retries:
+                print(f"❌ Failed to download {filename} after {retries + 1} attempts: {e}")
+                return {'file': filename, 'bytes': fetched, 'seconds': time.time() - t0, 'error': str(e)}
+            wait = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️  {filename}: {e}. Retrying in {wait:.0f}s ({attempt + 1}/{retries})...")
+            time.sleep(wait)
+
+    os.replace(part, filename)
+    if etag:
+        with open(filename + '.etag', 'w') as f:
+            f.write(etag)
+    with open(filename + '.complete', 'w') as f:
+        f.write(str(os.path.getsize(filename)))
+    elapsed = time.time() - t0
+    rate = fetched / max(elapsed, 1e-6) / 1e6
+    print(f"✅ Successfully saved {filename} ({fetched / 1e6:,.1f} MB in {elapsed:.1f}s, {rate:.1f} MB/s).")
+    return {'file': filename, 'bytes': fetched, 'seconds': elapsed}
+
+def pruned_url(config, key, url):
+    prune = config.get('prune', {})
+    spec = prune.get('datasets', {}).get(key)
+    if not spec:
+        return url
+    where = None
+    # County mode keeps every township
+    if spec.get('townships') and prune.get('township_codes') and not geography.is_county(config):
+        where = "township_code IN (" + ', '.join(f"'{c}'" for c in prune['township_codes']) + ")"
+    return socrata.prune_url(url, spec.get('select'), where)
+
+def download_all(config):
+    settings = config.get('download', {})
+    paged_settings = {**settings, **config.get('socrata', {})}
+    # An input whose raw file was dropped after conversion to Parquet is not downloaded again
+    jobs = [(config['files'][key], pruned_url(config, key, url)) for key, url in config['urls'].items()
+            if os.path.exists(config['files'][key]) or not storage.has_parquet(config, key)]
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=settings.get('max_workers', 4)) as pool:
+        futures = [
+            pool.submit(socrata.fetch_dataset, filename, url, paged_settings) if socrata.is_socrata_csv(url)
+            else pool.submit(download_file, filename, url, settings)
+            for filename, url in jobs
+        ]
+        results = [f.result() for f in as_completed(futures)]
+
+    total = sum(r['bytes'] for r in results)
+    failed = [r['file'] for r in results if 'error' in r]
+    print(f"\n📥 Downloaded {total / 1e6:,.1f} MB in {time.time() - t0:.1f}s.")
+    if failed:
+        print(f"❌ {len(failed)} file(s) failed, re-run to resume: {', '.join(failed)}")
+    return results
+
+def setup_database(config, force=False):
     print("\n📦 Loading data into DuckDB...")
     con = duckdb.connect(config['database']['file_name'])
-    con.execute("INSTALL spatial; LOAD spatial;")
-
-    table_map = {
-        config['files']['chicago_zoning_geojson']: 'zoning',
-        config['files']['cook_parcels_geojson']: 'parcels',
-        config['files']['neighborhoods_geojson']: 'neighborhoods',
-        config['files']['cta_stations_geojson']: 'transit_stops',
-        config['files']['cta_bus_routes_geojson']: 'bus_routes',
-        config['files']['chicago_parks_geojson']: 'parks',
-        config['files']['assessor_universe_csv']: 'assessor_universe',
-        config['files']['assessed_values_2023_csv']: 'assessed_values',
-        config['files']['res_characteristics_csv']: 'res_characteristics',
-        config['files']['parcel_addresses_csv']: 'parcel_addresses',
-        config['files']['parcel_sales_csv']: 'parcel_sales',
-        config['files']['building_permits_csv']: 'building_permits',
-        config['files']['condo_characteristics_csv']: 'condo_characteristics',
-    }
-
-    for filename, table_name in table_map.items():
-        if not os.path.exists(filename):
+    storage.load_spatial(con)
+    resources.configure(con, config)
+    # Lets COPY stream row groups out as they are produced instead of buffering to keep file order
+    con.execute("SET preserve_insertion_order = false")
+    manifest.ensure_manifest_table(con)
+
+    t0 = time.time()
+    tables = storage.tables(config)
+    fingerprints = {key: manifest.fingerprint(con, config, key) for key in tables}
+    changed = []
+    for key, table_name in tables.items():
+        if not force and manifest.is_current(con, table_name, fingerprints[key]):
+            manifest.touch(con, table_name, fingerprints[key])
+            print(f"   ⏭️  Skipping '{table_name}': {config['files'][key]} unchanged since last load")
+        else:
+            changed.append(key)
+
+    converted = storage.convert_all(config, changed)
+    for key in changed:
+        table_name = storage.TABLES[key]
+        filename = config['files'][key]
+        result = converted[key]
+        if 'error' in result:
+            print(f"   ❌ Error loading '{table_name}': {result['error']}")
+            continue
+        source = result['source']
+        if source is None:
             print(f"⚠️  Skipping '{table_name}' because {filename} is missing.")
             continue
         try:
-            if filename.endswith('.csv'):
-                con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM read_csv_auto('{filename}', ignore_errors=true)")
-            else:
-                con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM ST_Read('{filename}')")
+            t1 = time.time()
+            columns = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM read_parquet('{source}')").fetchall()]
+            query = storage.load_query(source, columns, config.get('storage', {}).get('simplify_feet', 10.0))
+            con.execute(f"CREATE OR REPLACE TABLE {table_name} AS {query}")
+            if table_name in storage.INDEXED:
+                storage.create_spatial_index(con, table_name)
             count = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-            print(f"   ✅ Loaded table '{table_name}' ({count:,} rows)")
+            sync.reset_watermark(con, table_name)
+            if fingerprints[key]:
+                manifest.record(con, table_name, fingerprints[key], count)
+            print(f"   ✅ Loaded table '{table_name}' ({count:,} rows, {os.path.getsize(source) / 1e6:,.1f} MB parquet, "
+                  f"{result['seconds']:.1f}s convert + {time.time() - t1:.1f}s load)")
         except Exception as e:
             print(f"   ❌ Error loading '{table_name}': {e}")
+    print(f"   ⏱️  Loaded {len(changed)} of {len(tables)} tables in {time.time() - t0:.1f}s")
+
+    gtfs.setup_gtfs(con, config, force)
+    amenities.build_amenity_distance(con, config, force)
+
+    if 'parcel_addresses_csv' in changed and 'parcel_addresses' in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        with open('sql/00_address_keys.sql', 'r') as f:
+            con.execute(f.read())
+        count = con.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+        print(f"   ✅ Encoded {count:,} distinct addresses as address_id")
+
+    rejects_glob = storage.rejects_path(config, '*')
+    con.execute(f"""
+        CREATE OR REPLACE TABLE _rejects AS
+        SELECT * FROM read_parquet('{rejects_glob}')
+    """ if glob.glob(rejects_glob) else "CREATE OR REPLACE TABLE _rejects (table_name VARCHAR, failed_columns VARCHAR[], raw_row VARCHAR)")
+    for table_name, n in con.execute("SELECT table_name, COUNT(*) FROM _rejects GROUP BY 1 ORDER BY 1").fetchall():
+        print(f"   ⚠️  {n:,} unparseable rows from '{table_name}' kept in _rejects")
 
     con.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download inputs and load them into DuckDB")
+    parser.add_argument('--force', action='store_true', help="Reload every table even if its source is unchanged")
+    parser.add_argument('--sync', action='store_true', help="Only fetch rows newer than the stored watermarks for the datasets under sync: (Fast)")
+    args = parser.parse_args()
+
     config = load_config()
-    for key, url in config['urls'].items():
-        filename = config['files'][key]
-        download_file(filename, url)
-    setup_database(config)
+    if args.sync:
+        sync.sync_all(config)
+        raise SystemExit
+    download_all(config)
+    setup_database(config, force=args.force)
     print("\n🚀 Ready! Now run: python3 sandbox.py")
@@ -0,0 +1,99 @@
+import glob
+import os
+import shutil
+import time
+import duckdb
+from jinja2 import Template
+import resources
+import spatial_engine
+
+def settings(config):
+    return config.get('envelope', {})
+
+def setback_expr(config):
+    setbacks = dict(settings(config).get('setback_feet', {}))
+    default = float(setbacks.pop('default', 5))
+    # Longest prefix first so e.g. RT-3.5 can be listed apart from RT
+    cases = ' '.join(f"WHEN zone_class LIKE '{prefix}%' THEN {float(feet)}"
+                     for prefix, feet in sorted(setbacks.items(), key=lambda kv: -len(kv[0])))
+    return f"CASE {cases} ELSE {default} END" if cases else str(default)
+
+def envelope_dir(config):
+    return os.path.join(spatial_engine.tile_dir(config), '_envelopes')
+
+def run_envelope_tile(config, tile, threads):
+    t0 = time.time()
+    s = settings(config)
+    tile_size = float(config.get('spatial_engine', {}).get('tile_size_feet', 10000))
+    x0, y0 = tile[0] * tile_size, tile[1] * tile_size
+    adjacency = float(s.get('adjacency_feet', 3))
+    con = spatial_engine.worker_connection(config, threads)
+    try:
+        con.execute(f"""
+            CREATE VIEW envelope_todo AS SELECT * FROM src.main._envelope_todo
+            WHERE (xmin + xmax) / 2 >= {x0} AND (xmin + xmax) / 2 < {x0 + tile_size}
+              AND (ymin + ymax) / 2 >= {y0} AND (ymin + ymax) / 2 < {y0 + tile_size}
+        """)
+        # Only parcels within adjacency_feet of the tile's lots can be their neighbours
+        bx0, by0, bx1, by1 = con.execute("SELECT MIN(xmin), MIN(ymin), MAX(xmax), MAX(ymax) FROM envelope_todo").fetchone()
+        con.execute(f"CREATE TABLE parcels AS {spatial_engine.window('parcels', bx0 - adjacency, by0 - adjacency, bx1 + adjacency, by1 + adjacency)}")
+        with open('sql/01b_parcel_envelopes.sql', 'r') as f:
+            template = Template(f.read())
+        con.execute(template.render(adjacency_feet=adjacency, corner_setback_feet=float(s.get('corner_setback_feet', 5))))
+        out = os.path.join(envelope_dir(config), f"tile_{tile[0]}_{tile[1]}.parquet")
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        con.execute(f"COPY new_envelopes TO '{out}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+        rows = con.execute("SELECT COUNT(*) FROM new_envelopes").fetchone()[0]
+        return {'tile': tile, 'rows': rows, 'seconds': time.time() - t0, 'peak': resources.peak_bytes()}
+    finally:
+        con.close()
+
+# Like build_spatial_base, the caller must not hold a write connection while the workers run
+def build_envelopes(config):
+    s = settings(config)
+    db_file = config['database']['file_name']
+    params = f"{float(s.get('adjacency_feet', 3))}|{float(s.get('corner_setback_feet', 5))}"
+
+    # Cached per parcel on its geometry hash, setback and settings; only new or reshaped lots are measured again.
+    # Rows for parcels outside spatial_base are kept so a sandbox run doesn't throw away the citywide cache
+    con = duckdb.connect(db_file)
+    con.execute("LOAD spatial")
+    resources.configure(con, config)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS parcel_envelopes (
+            pin10 BIGINT, geom_hash VARCHAR, params VARCHAR, setback_feet DOUBLE, frontage_feet DOUBLE, depth_feet DOUBLE,
+            shared_sides INTEGER, is_corner BOOLEAN, envelope_sqft DOUBLE
+        )
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE _envelope_todo AS
+        SELECT * FROM (
+            SELECT pin10, md5(ST_AsHEXWKB(geom_3435)) as geom_hash, '{params}' as params, {setback_expr(config)} as setback_feet,
+                   geom_3435, xmin, ymin, xmax, ymax
+            FROM spatial_base
+        ) sb
+        WHERE NOT EXISTS (
+            SELECT 1 FROM parcel_envelopes e
+            WHERE e.pin10 = sb.pin10 AND e.geom_hash = sb.geom_hash AND e.params = sb.params AND e.setback_feet = sb.setback_feet
+        )
+    """)
+    todo = con.execute("SELECT COUNT(*) FROM _envelope_todo").fetchone()[0]
+    tile_size = float(config.get('spatial_engine', {}).get('tile_size_feet', 10000))
+    tiles = con.execute(f"SELECT DISTINCT {spatial_engine.tile_expr(tile_size)} FROM _envelope_todo ORDER BY 1, 2").fetchall()
+    con.close()
+    if not todo:
+        return {'parcels': 0, 'tiles': []}
+
+    shutil.rmtree(envelope_dir(config), ignore_errors=True)
+    results = spatial_engine.map_tiles(config, run_envelope_tile, [tuple(t) for t in tiles])
+
+    con = duckdb.connect(db_file)
+    resources.configure(con, config)
+    con.execute("DELETE FROM parcel_envelopes WHERE pin10 IN (SELECT pin10 FROM _envelope_todo)")
+    files = os.path.join(envelope_dir(config), 'tile_*.parquet')
+    if glob.glob(files):
+        con.execute(f"INSERT INTO parcel_envelopes BY NAME SELECT * FROM read_parquet('{files}')")
+    con.execute("DROP TABLE _envelope_todo")
+    con.close()
+    shutil.rmtree(envelope_dir(config), ignore_errors=True)
+    return {'parcels': todo, 'tiles': results}
@@ -249,24 +249,26 @@ def run_spatial_pipeline(con, is_sandbox=False):
         con.execute("""
             CREATE OR REPLACE TEMPORARY TABLE step1_parcels AS
             WITH test_nbhds AS (
-                SELECT geom, ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, UPPER(community) as neighborhood_name
-                FROM ST_Read('neighborhoods.geojson')
+                SELECT geom_3435, xmin, ymin, xmax, ymax, UPPER(community) as neighborhood_name
+                FROM neighborhoods
                 WHERE UPPER(community) IN ('LINCOLN PARK', 'LAKE VIEW', 'ASHBURN', 'AUSTIN')
             )
-            SELECT p.pin10, ST_Transform(p.geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, tn.neighborhood_name
+            SELECT p.pin10, p.geom_3435, tn.neighborhood_name
             FROM parcels p
-            JOIN test_nbhds tn ON ST_Intersects(p.geom, tn.geom)
-            WHERE p.geom IS NOT NULL
+            JOIN test_nbhds tn ON p.xmax >= tn.xmin AND p.xmin <= tn.xmax AND p.ymax >= tn.ymin AND p.ymin <= tn.ymax
+                AND ST_Intersects(p.geom_3435, tn.geom_3435)
+            WHERE p.geom_3435 IS NOT NULL
         """)
     else:
         print("⏳ [1/5] Isolating citywide parcels and joining neighborhoods...", end="", flush=True)
         con.execute("""
             CREATE OR REPLACE TEMPORARY TABLE step1_parcels AS
-            WITH nbhds AS (SELECT geom, ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, UPPER(community) as neighborhood_name FROM ST_Read('neighborhoods.geojson'))
-            SELECT p.pin10, ST_Transform(p.geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, n.neighborhood_name
+            WITH nbhds AS (SELECT geom_3435, xmin, ymin, xmax, ymax, UPPER(community) as neighborhood_name FROM neighborhoods)
+            SELECT p.pin10, p.geom_3435, n.neighborhood_name
             FROM parcels p
-            LEFT JOIN nbhds n ON ST_Intersects(p.geom, n.geom)
-            WHERE p.geom IS NOT NULL
+            LEFT JOIN nbhds n ON p.xmax >= n.xmin AND p.xmin <= n.xmax AND p.ymax >= n.ymin AND p.ymin <= n.ymax
+                AND ST_Intersects(p.geom_3435, n.geom_3435)
+            WHERE p.geom_3435 IS NOT NULL
         """)
     print(f" ✅ ({time.time() - t0:.1f}s)")
 
@@ -275,7 +277,7 @@ def run_spatial_pipeline(con, is_sandbox=False):
     con.execute("""
         CREATE OR REPLACE TEMPORARY TABLE step2_eligible AS
         WITH target_zones AS (
-            SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, zone_class 
+            SELECT geom_3435, zone_class 
             FROM zoning WHERE zone_class SIMILAR TO '(RS|RT|RM|B|C).*'
         ),
         base_parcels AS (
@@ -284,14 +286,14 @@ def run_spatial_pipeline(con, is_sandbox=False):
             JOIN target_zones z ON ST_Intersects(p.geom_3435, z.geom_3435)
         ),
         u_agg AS (
-            SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, 
+            SELECT pin10, 
                    ANY_VALUE(CAST("class" AS VARCHAR)) as property_class,
                    COUNT(pin) as tax_pin_count
             FROM assessor_universe GROUP BY 1
         ),
-        v_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value, SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value FROM assessed_values GROUP BY 1),
-        rc_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, MAX(TRY_CAST(char_yrblt AS INT)) as char_yrblt, SUM(TRY_CAST(char_bldg_sf AS DOUBLE)) as char_bldg_sf FROM res_characteristics GROUP BY 1),
-        pa_agg AS (SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, ANY_VALUE(CAST(prop_address_full AS VARCHAR)) as prop_address FROM parcel_addresses GROUP BY 1)
+        v_agg AS (SELECT pin10, SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value, SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value FROM assessed_values GROUP BY 1),
+        rc_agg AS (SELECT pin10, MAX(TRY_CAST(char_yrblt AS INT)) as char_yrblt, SUM(TRY_CAST(char_bldg_sf AS DOUBLE)) as char_bldg_sf FROM res_characteristics GROUP BY 1),
+        pa_agg AS (SELECT pin10, ANY_VALUE(CAST(prop_address_full AS VARCHAR)) as prop_address FROM parcel_addresses GROUP BY 1)
         
         SELECT bp.pin10, bp.geom_3435, bp.neighborhood_name, bp.area_sqft, bp.zone_class,
             u.property_class as primary_prop_class,
@@ -324,9 +326,9 @@ def run_spatial_pipeline(con, is_sandbox=False):
     con.execute("""
         CREATE OR REPLACE TEMPORARY TABLE step3_distances AS
         WITH 
-        projected_transit AS (SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435 FROM transit_stops),
-        projected_bus_all AS (SELECT CAST(route AS VARCHAR) as route, ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435 FROM bus_routes),
-        projected_bus_hf AS (SELECT geom_3435 FROM projected_bus_all WHERE route IN ('4', '9', '12', '14', 'J14', '20', '34', '47', '49', '53', '54', '55', '60', '63', '66', '72', '77', '79', '81', '82', '95')),
+        projected_transit AS (SELECT geom_3435 FROM transit_stops),
+        projected_bus_all AS (SELECT CAST(route AS VARCHAR) as route, geom_3435 FROM bus_routes),
+        projected_bus_hf AS (SELECT geom_3435 FROM projected_bus_all WHERE route IN (SELECT route FROM hf_routes)),
         projected_bus_brt AS (SELECT geom_3435 FROM projected_bus_all WHERE route = 'J14'),
         
         train_1320 AS (SELECT DISTINCT ep.pin10 FROM step2_eligible ep JOIN projected_transit t ON ST_Intersects(ep.geom_3435, ST_Buffer(t.geom_3435, 1320))),
@@ -336,7 +338,7 @@ def run_spatial_pipeline(con, is_sandbox=False):
         hf_1320 AS (SELECT DISTINCT ep.pin10 FROM step2_eligible ep JOIN projected_bus_hf b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 1320))),
         
         bus_counts AS (
-            SELECT ep.pin10, COUNT(DISTINCT b.route) as all_bus_count, COUNT(DISTINCT CASE WHEN b.route IN ('4', '9', '12', '14', 'J14', '20', '34', '47', '49', '53', '54', '55', '60', '63', '66', '72', '77', '79', '81', '82', '95') THEN b.route END) as hf_bus_count
+            SELECT ep.pin10, COUNT(DISTINCT b.route) as all_bus_count, COUNT(DISTINCT CASE WHEN b.route IN (SELECT route FROM hf_routes) THEN b.route END) as hf_bus_count
             FROM step2_eligible ep JOIN projected_bus_all b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 1320)) GROUP BY ep.pin10
         )
         
@@ -369,7 +371,7 @@ def run_spatial_pipeline(con, is_sandbox=False):
     con.execute("""
         CREATE OR REPLACE TEMPORARY TABLE step4_sales_ratio AS
         WITH clean_sales AS (
-            SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10, 
+            SELECT pin10, 
                    TRY_CAST(sale_price AS DOUBLE) as sale_price
             FROM parcel_sales
             WHERE TRY_CAST(sale_price AS DOUBLE) > 20000 
@@ -2,6 +2,7 @@ import folium
 from folium.features import DivIcon
 import json
 import yaml
+import geography
 
 def load_config():
     with open('config.yaml', 'r') as f:
@@ -11,13 +12,15 @@ def build_map(df_neighborhoods):
     print("Generating Interactive Map...")
     config = load_config()
 
-    with open(config['files']['neighborhoods_geojson'], 'r') as f:
+    # Community areas, or municipalities in county mode; area_name matches neighborhood_name in the results
+    with open(config['files'][geography.file_key(config)], 'r') as f:
         geo_data = json.load(f)
 
     unit_lookup = df_neighborhoods.set_index('neighborhood_name').to_dict('index')
 
     for feature in geo_data['features']:
-        name = feature['properties']['community'].upper()
+        name = str(feature['properties'][geography.name_column(config)]).upper()
+        feature['properties']['area_name'] = name
         stats = unit_lookup.get(name, {})
         feature['properties']['m0_val'] = f"{stats.get('feasible_existing', 0):,.0f}"
         feature['properties']['m1_val'] = f"{stats.get('new_pritzker', 0):,.0f}"
@@ -30,13 +33,16 @@ def build_map(df_neighborhoods):
         feature['properties']['m5_val'] = f"{stats.get('tot_train_and_hf_bus', 0):,.0f}"
         feature['properties']['m5_diff'] = f"+{stats.get('add_train_and_hf_bus', 0):,.0f}"
 
-    m = folium.Map(location=[41.84, -87.68], zoom_start=11, tiles=None)
+    if geography.is_county(config):
+        m = folium.Map(location=[41.84, -87.85], zoom_start=10, tiles=None)
+    else:
+        m = folium.Map(location=[41.84, -87.68], zoom_start=11, tiles=None)
     folium.TileLayer('CartoDB dark_matter', name='Base Map', control=False).add_to(m)
 
     def add_layer(title, data_col, tooltip_fields, tooltip_aliases, show_by_default=False):
         choro = folium.Choropleth(
             geo_data=geo_data, data=df_neighborhoods,
-            columns=['neighborhood_name', data_col], key_on='feature.properties.community',
+            columns=['neighborhood_name', data_col], key_on='feature.properties.area_name',
             fill_color='Greens', fill_opacity=0.7, line_opacity=0.2, line_color='white',
             name=title, show=show_by_default
         )
@@ -54,12 +60,12 @@ def build_map(df_neighborhoods):
         folium.GeoJsonTooltip(fields=tooltip_fields, aliases=tooltip_aliases, style="background-color: black; color: white;").add_to(choro.geojson)
         choro.add_to(m)
 
-    add_layer("0. Status Quo (Currently Feasible)", 'feasible_existing', ['community', 'm0_val'], ['Neighborhood:', 'Currently Feasible Units:'], False)
-    add_layer("1. Pritzker Upzoning", 'new_pritzker', ['community', 'm1_val'], ['Neighborhood:', 'Pritzker Units:'], False)
-    add_layer("2. TRUE CA SB 79 (Train+BRT)", 'tot_true_sb79', ['community', 'm2_val', 'm2_diff'], ['Neighborhood:', 'Total SB 79 Units:', 'Difference vs Pritzker:'], True)
-    add_layer("3. SB 79 Train Only", 'tot_train_only', ['community', 'm3_val', 'm3_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
-    add_layer("4. SB 79 Train + Bus Options", 'tot_train_and_bus_combo', ['community', 'm4_val', 'm4_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
-    add_layer("5. SB 79 Train + HF Bus", 'tot_train_and_hf_bus', ['community', 'm5_val', 'm5_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
+    add_layer("0. Status Quo (Currently Feasible)", 'feasible_existing', ['area_name', 'm0_val'], ['Neighborhood:', 'Currently Feasible Units:'], False)
+    add_layer("1. Pritzker Upzoning", 'new_pritzker', ['area_name', 'm1_val'], ['Neighborhood:', 'Pritzker Units:'], False)
+    add_layer("2. TRUE CA SB 79 (Train+BRT)", 'tot_true_sb79', ['area_name', 'm2_val', 'm2_diff'], ['Neighborhood:', 'Total SB 79 Units:', 'Difference vs Pritzker:'], True)
+    add_layer("3. SB 79 Train Only", 'tot_train_only', ['area_name', 'm3_val', 'm3_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
+    add_layer("4. SB 79 Train + Bus Options", 'tot_train_and_bus_combo', ['area_name', 'm4_val', 'm4_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
+    add_layer("5. SB 79 Train + HF Bus", 'tot_train_and_hf_bus', ['area_name', 'm5_val', 'm5_diff'], ['Neighborhood:', 'Total Units:', 'Difference vs Pritzker:'], False)
 
     folium.LayerControl(collapsed=False).add_to(m)
 
@@ -0,0 +1,25 @@
+def settings(config):
+    return config.get('geography', {})
+
+def is_county(config):
+    return settings(config).get('mode', 'city') == 'county'
+
+def file_key(config):
+    return 'municipalities_geojson' if is_county(config) else 'neighborhoods_geojson'
+
+def table(config):
+    return 'municipalities' if is_county(config) else 'neighborhoods'
+
+def name_column(config):
+    return settings(config).get('county', {}).get('name_column', 'municipality') if is_county(config) else 'community'
+
+def default_zone_class(config):
+    # Only the City of Chicago publishes zoning, so suburban parcels need a stand-in zone in county mode
+    return settings(config).get('county', {}).get('default_zone_class') if is_county(config) else None
+
+def areas_query(config):
+    # The polygons results are grouped by, each with its upper-cased name as area_name
+    return f'SELECT *, UPPER(CAST("{name_column(config)}" AS VARCHAR)) AS area_name FROM {table(config)}'
+
+def mode_key(config):
+    return f"{'county' if is_county(config) else 'city'}/{name_column(config)}/{default_zone_class(config) or ''}"
@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import manifest
+
+GTFS_TABLES = ['routes', 'trips', 'stops', 'calendar', 'calendar_dates', 'stop_times']
+
+def extract_member(zf, name, out_dir):
+    # Copied in chunks so the multi-million-row stop_times.txt never sits in memory
+    path = os.path.join(out_dir, name)
+    with zf.open(name) as src, open(path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 16 * 1024 * 1024)
+    return path
+
+def load_feed(con, zip_path):
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(zip_path) as zf:
+        members = set(zf.namelist())
+        for name in GTFS_TABLES:
+            if f"{name}.txt" not in members:
+                con.execute(f"DROP TABLE IF EXISTS gtfs_{name}")
+                continue
+            path = extract_member(zf, f"{name}.txt", tmp)
+            con.execute(f"CREATE OR REPLACE TABLE gtfs_{name} AS SELECT * FROM read_csv('{path}', header=true, all_varchar=true)")
+
+def build_frequencies(con, settings):
+    threshold = float(settings.get('hf_headway_minutes', 15))
+    windows = {'peak': settings.get('peak_hours', [[7, 9], [16, 18]]), 'offpeak': settings.get('offpeak_hours', [[10, 15]])}
+    window_rows = ', '.join(f"('{period}', {int(a)}, {int(b)})" for period, spans in windows.items() for a, b in spans)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    has_calendar, has_dates = 'gtfs_calendar' in tables, 'gtfs_calendar_dates' in tables
+    if not has_calendar and not has_dates:
+        return 0
+    service_date = settings.get('service_date')
+
+    # One representative weekday: configured, or the first Wednesday of the newest weekday schedule. Feeds that list
+    # every service day in calendar_dates.txt alone use the Wednesday with the most services running
+    if service_date:
+        day = f"DATE '{service_date}'"
+    elif has_calendar:
+        day = """(SELECT d + CAST((3 - dayofweek(d) + 7) % 7 AS INTEGER) FROM (
+                    SELECT MAX(strptime(start_date, '%Y%m%d')::DATE) AS d FROM gtfs_calendar WHERE wednesday = '1'))"""
+    else:
+        day = """(SELECT strptime(date, '%Y%m%d')::DATE FROM gtfs_calendar_dates
+                  WHERE exception_type = '1' AND dayofweek(strptime(date, '%Y%m%d')::DATE) = 3
+                  GROUP BY 1 ORDER BY COUNT(DISTINCT service_id) DESC, 1 DESC LIMIT 1)"""
+    base = """
+            SELECT c.service_id FROM gtfs_calendar c, d
+            WHERE d.service_day BETWEEN strptime(c.start_date, '%Y%m%d')::DATE AND strptime(c.end_date, '%Y%m%d')::DATE
+              AND CASE dayofweek(d.service_day)
+                    WHEN 0 THEN c.sunday WHEN 1 THEN c.monday WHEN 2 THEN c.tuesday WHEN 3 THEN c.wednesday
+                    WHEN 4 THEN c.thursday WHEN 5 THEN c.friday ELSE c.saturday END = '1'
+    """ if has_calendar else "SELECT CAST(NULL AS VARCHAR) AS service_id WHERE false"
+    services = "SELECT service_id FROM base"
+    if has_dates:
+        on_day = "FROM gtfs_calendar_dates cd, d WHERE strptime(cd.date, '%Y%m%d')::DATE = d.service_day"
+        services = f"""
+            SELECT service_id FROM base WHERE service_id NOT IN (SELECT cd.service_id {on_day} AND cd.exception_type = '2')
+            UNION
+            SELECT cd.service_id {on_day} AND cd.exception_type = '1'
+        """
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _gtfs_services AS
+        WITH d AS (SELECT {day} AS service_day),
+        base AS ({base})
+        {services}
+    """)
+    running = con.execute("SELECT COUNT(*) FROM _gtfs_services").fetchone()[0]
+    if not running:
+        con.execute("DROP TABLE _gtfs_services")
+        return 0
+
+    # Times past midnight are written as 24:xx:xx and later, so parse to seconds instead of TIME
+    con.execute(f"""
+        CREATE OR REPLACE TABLE gtfs_stop_frequency AS
+        WITH windows(period, start_hour, end_hour) AS (VALUES {window_rows}),
+        departures AS (
+            SELECT t.route_id, st.stop_id, COALESCE(t.direction_id, '0') AS direction_id,
+                   list_reduce(list_transform(string_split(st.departure_time, ':'), x -> CAST(x AS INTEGER)), (a, b) -> a * 60 + b) AS dep_sec
+            FROM gtfs_stop_times st
+            JOIN gtfs_trips t ON st.trip_id = t.trip_id
+            JOIN _gtfs_services s ON t.service_id = s.service_id
+            WHERE st.departure_time IS NOT NULL AND st.departure_time != ''
+        ),
+        minutes AS (SELECT period, SUM(end_hour - start_hour) * 60.0 AS window_minutes FROM windows GROUP BY 1)
+        SELECT d.route_id AS route, d.stop_id, d.direction_id, w.period,
+               COUNT(*) AS departures,
+               ANY_VALUE(m.window_minutes) / COUNT(*) AS headway_min
+        FROM departures d
+        JOIN windows w ON d.dep_sec % 86400 >= w.start_hour * 3600 AND d.dep_sec % 86400 < w.end_hour * 3600
+        JOIN minutes m ON w.period = m.period
+        GROUP BY 1, 2, 3, 4
+    """)
+
+    # A route's headway is its busiest stop in its worst direction; it is high-frequency only if both periods qualify
+    con.execute("""
+        CREATE OR REPLACE TABLE gtfs_route_frequency AS
+        WITH per_direction AS (
+            SELECT route, direction_id, period, MIN(headway_min) AS headway_min
+            FROM gtfs_stop_frequency GROUP BY 1, 2, 3
+        )
+        SELECT p.route,
+               MAX(CASE WHEN period = 'peak' THEN headway_min END) AS peak_headway_min,
+               MAX(CASE WHEN period = 'offpeak' THEN headway_min END) AS offpeak_headway_min
+        FROM per_direction p
+        JOIN gtfs_routes r ON p.route = r.route_id AND r.route_type = '3'
+        GROUP BY 1
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE hf_routes AS
+        SELECT CAST(route AS VARCHAR) AS route, peak_headway_min, offpeak_headway_min, 'gtfs' AS source
+        FROM gtfs_route_frequency
+        WHERE peak_headway_min <= {threshold} AND offpeak_headway_min <= {threshold}
+    """)
+    con.execute("DROP TABLE _gtfs_services")
+    return running
+
+def fallback_hf_routes(con, settings):
+    routes = [str(r) for r in settings.get('fallback_hf_routes', [])]
+    con.execute("CREATE OR REPLACE TABLE hf_routes (route VARCHAR, peak_headway_min DOUBLE, offpeak_headway_min DOUBLE, source VARCHAR)")
+    if routes:
+        con.executemany("INSERT INTO hf_routes VALUES (?, NULL, NULL, 'config')", [[r] for r in routes])
+
+def setup_gtfs(con, config, force=False):
+    settings = config.get('gtfs', {})
+    zip_path = config['files'].get('cta_gtfs_zip')
+    if not zip_path or not os.path.exists(zip_path):
+        fallback_hf_routes(con, settings)
+        print(f"   ⚠️  No GTFS feed at {zip_path}; using {len(settings.get('fallback_hf_routes', []))} configured high-frequency routes")
+        return
+
+    fp = manifest.file_fingerprint(con, 'gtfs_stop_times', zip_path, [zip_path])
+    if not force and manifest.is_current(con, 'gtfs_stop_times', fp) and 'hf_routes' in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        manifest.touch(con, 'gtfs_stop_times', fp)
+        print(f"   ⏭️  Skipping GTFS: {zip_path} unchanged since last load")
+        return
+
+    t0 = time.time()
+    load_feed(con, zip_path)
+    if not build_frequencies(con, settings):
+        # Stop-level frequencies from an earlier feed would no longer match the configured routes
+        con.execute("DROP TABLE IF EXISTS gtfs_stop_frequency")
+        con.execute("DROP TABLE IF EXISTS gtfs_route_frequency")
+        fallback_hf_routes(con, settings)
+        print(f"   ⚠️  {zip_path} has no weekday service in calendar.txt or calendar_dates.txt; "
+              f"using {len(settings.get('fallback_hf_routes', []))} configured high-frequency routes")
+        return
+    stop_times = con.execute("SELECT COUNT(*) FROM gtfs_stop_times").fetchone()[0]
+    manifest.record(con, 'gtfs_stop_times', fp, stop_times)
+    hf = [r[0] for r in con.execute("SELECT route FROM hf_routes ORDER BY TRY_CAST(route AS INTEGER), route").fetchall()]
+    print(f"   ✅ Loaded GTFS ({stop_times:,} stop times in {time.time() - t0:.1f}s); {len(hf)} high-frequency routes: {', '.join(hf)}")
+
+def ensure_hf_routes(con, config):
+    if 'hf_routes' not in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        fallback_hf_routes(con, config.get('gtfs', {}))
@@ -14,6 +14,7 @@ def load_config():
 def main():
     parser = argparse.ArgumentParser(description="Housing Policy Impact Analyzer Pipeline")
     parser.add_argument('--recalculate', action='store_true', help="Recalculate ALL spatial data (Slow)")
+    parser.add_argument('--refresh', action='store_true', help="Recalculate spatial data only for parcels affected by layer changes since the last run")
     parser.add_argument('--filter-only', action='store_true', help="Only re-apply the feasibility filters to existing spatial data (Fast)")
     parser.add_argument('--no-browser', action='store_true', help="Do not automatically open the browser at the end")
     args = parser.parse_args()
@@ -22,6 +23,8 @@ def main():
 
     if args.recalculate:
         run_parcel_calculations(full_recalculate=True)
+    elif args.refresh:
+        run_parcel_calculations(full_recalculate=True, incremental=True)
     elif args.filter_only:
         run_parcel_calculations(full_recalculate=False)
 
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import schemas
+import socrata
+import storage
+
+def ensure_manifest_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _manifest (
+            table_name VARCHAR PRIMARY KEY,
+            source VARCHAR,
+            file_hash VARCHAR,
+            size BIGINT,
+            mtime DOUBLE,
+            etag VARCHAR,
+            row_count BIGINT,
+            schema VARCHAR,
+            loaded_at TIMESTAMP,
+            source_hash VARCHAR
+        )
+    """)
+    con.execute("ALTER TABLE _manifest ADD COLUMN IF NOT EXISTS source_hash VARCHAR")
+
+def source_files(config, key):
+    filename = config['files'][key]
+    if socrata.is_complete(filename):
+        out_dir = socrata.chunk_dir(filename)
+        files = [os.path.join(out_dir, n) for n in sorted(os.listdir(out_dir)) if n.endswith('.parquet')]
+    elif os.path.exists(filename):
+        files = [filename]
+    else:
+        # Raw input was dropped after conversion; the parquet copy is the source of truth
+        files = [storage.parquet_path(config, storage.TABLES[key])]
+    clip = storage.clip_area(config, key)
+    if clip and os.path.exists(clip):
+        files.append(clip)
+    return [f for f in files if os.path.exists(f)]
+
+def file_hash(files, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    for path in files:
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                h.update(chunk)
+    return h.hexdigest()
+
+def load_params(config, table_name):
+    # Settings the load applies on top of the source; changing one reloads the table just as a changed file would
+    return json.dumps({'simplify_feet': float(config.get('storage', {}).get('simplify_feet', 10.0)),
+                       'schema': schemas.schema_hash(table_name)}, sort_keys=True)
+
+def file_fingerprint(con, table_name, source, files, etag=None, params=None):
+    if not files:
+        return None
+    ensure_manifest_table(con)
+    size = sum(os.path.getsize(f) for f in files)
+    mtime = max(os.path.getmtime(f) for f in files)
+
+    # Hashing a multi-GB GeoJSON is slow, so the stored hash is reused while size and mtime are unchanged
+    row = con.execute("SELECT source_hash, size, mtime FROM _manifest WHERE table_name = ?", [table_name]).fetchone()
+    if row and row[0] and row[1] == size and row[2] == mtime:
+        digest = row[0]
+    else:
+        digest = file_hash(files)
+    combined = hashlib.sha256(f"{digest}|{params}".encode()).hexdigest() if params else digest
+    return {'source': source, 'file_hash': combined, 'source_hash': digest, 'size': size, 'mtime': mtime, 'etag': etag}
+
+def fingerprint(con, config, key):
+    etag_path = config['files'][key] + '.etag'
+    etag = open(etag_path).read().strip() if os.path.exists(etag_path) else None
+    table_name = storage.TABLES[key]
+    return file_fingerprint(con, table_name, config['files'][key], source_files(config, key), etag, load_params(config, table_name))
+
+def is_current(con, table_name, fp):
+    if fp is None:
+        return False
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if table_name not in tables:
+        return False
+    row = con.execute("SELECT file_hash FROM _manifest WHERE table_name = ?", [table_name]).fetchone()
+    return row is not None and row[0] == fp['file_hash']
+
+def record(con, table_name, fp, row_count):
+    schema = json.dumps({r[0]: r[1] for r in con.execute(f"DESCRIBE {table_name}").fetchall()})
+    con.execute("""
+        INSERT OR REPLACE INTO _manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, now()::TIMESTAMP, ?)
+    """, [table_name, fp['source'], fp['file_hash'], fp['size'], fp['mtime'], fp['etag'], row_count, schema, fp['source_hash']])
+
+def touch(con, table_name, fp):
+    con.execute("UPDATE _manifest SET size = ?, mtime = ?, etag = ? WHERE table_name = ?", [fp['size'], fp['mtime'], fp['etag'], table_name])
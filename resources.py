@@ -0,0 +1,70 @@
+import os
+import resource
+import shutil
+import sys
+import time
+
+def settings(config):
+    return config.get('resources', {})
+
+def memory_budget(config):
+    # Bytes DuckDB may use across the whole run; by default three quarters of physical memory
+    gb = settings(config).get('memory_limit_gb')
+    if gb:
+        return float(gb) * 1024 ** 3
+    try:
+        return 0.75 * os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def temp_root(config):
+    return settings(config).get('temp_directory', 'data/tmp')
+
+def configure(con, config, workers=1, scope=None):
+    # Each of the workers running at once gets an equal share of the budget and spills past it. Connections in
+    # different processes (or threads) need their own temp directory, named by scope, or their spill files collide
+    budget = memory_budget(config)
+    if budget:
+        con.execute(f"SET memory_limit = '{int(budget / workers / 1024 ** 2)}MB'")
+    path = os.path.join(temp_root(config), scope) if scope else temp_root(config)
+    os.makedirs(path, exist_ok=True)
+    con.execute(f"SET temp_directory = '{path}'")
+
+def clear_temp(config, scope):
+    shutil.rmtree(os.path.join(temp_root(config), scope), ignore_errors=True)
+
+def reset_peak():
+    # Linux lets a process reset its own high-water mark, so each stage reports its own peak; elsewhere the peak
+    # is the highest since the process started
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def start():
+    reset_peak()
+    return time.time()
+
+def finish(report, name, t0, results=()):
+    # results are the per-tile dicts of worker stages, each carrying its worker's peak
+    report.append({'stage': name, 'seconds': time.time() - t0, 'peak': peak_bytes(),
+                   'worker_peak': max((r.get('peak', 0) for r in results), default=0)})
+    return time.time() - t0
+
+def print_report(report):
+    print("\n📊 Stage time and peak memory (main process / largest worker):")
+    for r in report:
+        workers = f" / {r['worker_peak'] / 1024 ** 3:.2f} GB" if r['worker_peak'] else ""
+        print(f"   {r['stage']:<40} {r['seconds']:>8.1f}s  {r['peak'] / 1024 ** 3:.2f} GB{workers}")
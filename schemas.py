@@ -0,0 +1,81 @@
+import hashlib
+import json
+
+# Native types applied once at ingest. Values that don't parse are routed to _rejects instead of the table;
+# columns not listed here are kept as read.
+SCHEMAS = {
+    'assessor_universe': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'class': 'VARCHAR',
+        'township_code': 'VARCHAR',
+    },
+    'assessed_values': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'class': 'VARCHAR',
+        'certified_bldg': 'DOUBLE',
+        'certified_land': 'DOUBLE',
+        'certified_tot': 'DOUBLE',
+    },
+    'res_characteristics': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'class': 'VARCHAR',
+        'char_yrblt': 'INTEGER',
+        'char_bldg_sf': 'DOUBLE',
+    },
+    'parcel_addresses': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'prop_address_full': 'VARCHAR',
+        'mail_address_name': 'VARCHAR',
+    },
+    'parcel_sales': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'sale_date': 'DATE',
+        'sale_price': 'DOUBLE',
+        'doc_no': 'VARCHAR',
+        'is_multisale': 'BOOLEAN',
+        'buyer_name': 'VARCHAR',
+    },
+    'building_permits': {
+        'id': 'VARCHAR',
+        'permit_type': 'VARCHAR',
+        'issue_date': 'DATE',
+        'reported_cost': 'DOUBLE',
+    },
+    'condo_characteristics': {
+        'pin': 'VARCHAR',
+        'year': 'INTEGER',
+        'year_built': 'INTEGER',
+        'unit_sf': 'DOUBLE',
+    },
+    'parcels': {
+        'pin10': 'BIGINT',
+    },
+}
+
+# Integer join keys derived from the 14-digit assessor PIN (dashes and lost leading zeros normalized)
+PIN14 = "TRY_CAST(LPAD(regexp_replace(CAST(pin AS VARCHAR), '[^0-9]', '', 'g'), 14, '0') AS BIGINT)"
+PIN_KEYS = f"{PIN14} AS pin14, {PIN14} // 10000 AS pin10"
+
+def schema_hash(table_name):
+    return hashlib.sha256(json.dumps(SCHEMAS.get(table_name, {}), sort_keys=True).encode()).hexdigest()[:16]
+
+def typed_select(table_name, columns):
+    schema = SCHEMAS.get(table_name, {})
+    exprs, checks = [], []
+    for col in columns:
+        name = '"' + col + '"'
+        raw = f"NULLIF(TRIM(CAST({name} AS VARCHAR)), '')"
+        if col in schema:
+            exprs.append(f"TRY_CAST({raw} AS {schema[col]}) AS {name}")
+            checks.append(f"CASE WHEN {raw} IS NOT NULL AND TRY_CAST({raw} AS {schema[col]}) IS NULL THEN '{col}' END")
+        else:
+            exprs.append(name)
+    if 'pin' in columns and 'pin10' not in columns:
+        exprs.append(PIN_KEYS)
+    failed = f"list_filter([{', '.join(checks)}], x -> x IS NOT NULL)" if checks else "[]::VARCHAR[]"
+    return ', '.join(exprs), failed
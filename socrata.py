@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+import random
+import shutil
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import duckdb
+import requests
+
+# Socrata column types that have a narrower native type than VARCHAR
+SODA_TYPES = {
+    'number': 'DOUBLE',
+    'double': 'DOUBLE',
+    'money': 'DOUBLE',
+    'percent': 'DOUBLE',
+    'checkbox': 'BOOLEAN',
+    'calendar_date': 'TIMESTAMP',
+    'floating_timestamp': 'TIMESTAMP',
+}
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (DataProject; python-requests)'}
+
+
+class TruncatedPage(Exception):
+    pass
+
+
+def is_socrata_csv(url):
+    parts = urlsplit(url)
+    return '/resource/' in parts.path and parts.path.endswith('.csv')
+
+def chunk_dir(filename):
+    return os.path.splitext(filename)[0]
+
+def is_complete(filename):
+    return os.path.exists(os.path.join(chunk_dir(filename), '_SUCCESS'))
+
+def parquet_glob(filename):
+    return os.path.join(chunk_dir(filename), 'part-*.parquet')
+
+def soda_url(url, fmt='csv', **params):
+    parts = urlsplit(url)
+    query = {k: v for k, v in parse_qsl(parts.query) if k not in ('$limit', '$offset', '$order')}
+    query.update(params)
+    path = os.path.splitext(parts.path)[0] + '.' + fmt
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ''))
+
+def add_where(url, clause, select=None):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query['$where'] = f"({query['$where']}) AND ({clause})" if '$where' in query else clause
+    if select:
+        query['$select'] = select
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+def prune_url(url, select=None, where=None):
+    # Full exports (/api/views/<id>/rows.csv) have no column or row filters; the SODA endpoint for the same id does
+    parts = urlsplit(url)
+    path = parts.path
+    if '/api/views/' in path and path.endswith('/rows.csv'):
+        path = '/resource/' + path.split('/api/views/')[1].split('/')[0] + '.csv'
+    query = {k: v for k, v in parse_qsl(parts.query) if k != 'accessType'}
+    if select:
+        query['$select'] = ', '.join(select)
+    url = urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ''))
+    return add_where(url, where) if where else url
+
+def count_rows(url, timeout=60):
+    r = requests.get(soda_url(url, 'json', **{'$select': 'count(*)'}), headers=HEADERS, timeout=timeout)
+    r.raise_for_status()
+    return int(list(r.json()[0].values())[0])
+
+def _page_columns(csv_path, headers):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        names = next(csv.reader(f), [])
+    try:
+        fields = json.loads(headers.get('X-SODA2-Fields', '[]'))
+        types = json.loads(headers.get('X-SODA2-Types', '[]'))
+    except ValueError:
+        fields, types = [], []
+    soda_types = dict(zip(fields, types))
+    return {name: SODA_TYPES.get(soda_types.get(name), 'VARCHAR') for name in names}
+
+def fetch_page(con, url, offset, page_size, expected, part, settings):
+    retries = settings.get('retries', 5)
+    backoff = settings.get('backoff_seconds', 2.0)
+    timeout = settings.get('timeout', 60)
+    tmp_csv = part + '.csv.tmp'
+    page_url = soda_url(url, **{'$order': settings.get('order', ':id'), '$limit': page_size, '$offset': offset})
+
+    for attempt in range(retries + 1):
+        try:
+            with requests.get(page_url, headers=HEADERS, stream=True, timeout=timeout) as r:
+                if r.status_code != 429 and 400 <= r.status_code < 500:
+                    r.raise_for_status()
+                if r.status_code >= 500 or r.status_code == 429:
+                    raise TruncatedPage(f"HTTP {r.status_code}")
+                with open(tmp_csv, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size=settings.get('chunk_size', 1024 * 1024)):
+                        f.write(chunk)
+                columns = _page_columns(tmp_csv, r.headers)
+
+            rows = con.execute(f"""
+                COPY (SELECT * FROM read_csv('{tmp_csv}', header=true, columns={columns!r}))
+                TO '{part}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """).fetchone()[0]
+            if rows != min(page_size, expected - offset):
+                raise TruncatedPage(f"page at offset {offset:,} returned {rows:,} rows")
+            os.replace(part + '.tmp', part)
+            return rows
+        except requests.HTTPError:
+            raise
+        except (requests.RequestException, duckdb.Error, TruncatedPage) as e:
+            if attempt == retries:
+                raise
+            wait = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️  {os.path.basename(part)}: {e}. Retrying in {wait:.0f}s ({attempt + 1}/{retries})...")
+            time.sleep(wait)
+        finally:
+            for tmp in (tmp_csv, part + '.tmp'):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+def fetch_dataset(filename, url, settings=None):
+    settings = settings or {}
+    page_size = settings.get('page_size', 100000)
+    out_dir = chunk_dir(filename)
+
+    if is_complete(filename):
+        print(f"✅ {out_dir}/ exists. Skipping.")
+        return {'file': out_dir, 'bytes': 0, 'seconds': 0.0, 'skipped': True}
+
+    t0 = time.time()
+    try:
+        expected = count_rows(url, settings.get('timeout', 60))
+    except (requests.RequestException, ValueError, IndexError) as e:
+        print(f"❌ Failed to count rows for {out_dir}: {e}")
+        return {'file': out_dir, 'bytes': 0, 'seconds': time.time() - t0, 'error': str(e)}
+
+    # Pages are only resumable if they were cut the same way
+    meta = {'url': url, 'page_size': page_size, 'expected_rows': expected}
+    meta_path = os.path.join(out_dir, '_meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) != meta:
+                shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    if expected == 0:
+        with open(os.path.join(out_dir, '_SUCCESS'), 'w') as f:
+            f.write('0')
+        print(f"✅ {out_dir}/ has no matching rows.")
+        return {'file': out_dir, 'bytes': 0, 'seconds': time.time() - t0, 'rows': 0}
+
+    pages = -(-expected // page_size)
+    print(f"⬇️  Paging {out_dir}/ ({expected:,} rows in {pages} pages)...")
+    con = duckdb.connect()
+    total = 0
+    try:
+        for page in range(pages):
+            part = os.path.join(out_dir, f"part-{page:05d}.parquet")
+            if os.path.exists(part):
+                total += con.execute(f"SELECT COUNT(*) FROM read_parquet('{part}')").fetchone()[0]
+                continue
+            total += fetch_page(con, url, page * page_size, page_size, expected, part, settings)
+    except Exception as e:
+        print(f"❌ Failed to page {out_dir}/ at page {page}: {e}. Re-run to resume.")
+        return {'file': out_dir, 'bytes': 0, 'seconds': time.time() - t0, 'error': str(e)}
+    finally:
+        con.close()
+
+    if total != expected:
+        msg = f"received {total:,} of {expected:,} rows"
+        print(f"❌ {out_dir}/ is truncated: {msg}.")
+        return {'file': out_dir, 'bytes': 0, 'seconds': time.time() - t0, 'error': msg}
+
+    with open(os.path.join(out_dir, '_SUCCESS'), 'w') as f:
+        f.write(str(total))
+    size = sum(os.path.getsize(os.path.join(out_dir, n)) for n in os.listdir(out_dir) if n.endswith('.parquet'))
+    elapsed = time.time() - t0
+    print(f"✅ Successfully saved {out_dir}/ ({total:,} rows, {size / 1e6:,.1f} MB parquet in {elapsed:.1f}s, {total / max(elapsed, 1e-6):,.0f} rows/s).")
+    return {'file': out_dir, 'bytes': size, 'seconds': elapsed, 'rows': total}
@@ -0,0 +1,293 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import duckdb
+import yaml
+from jinja2 import Template
+import geography
+import resources
+import walk_network
+
+# Tables written by sql/01_spatial_joins.sql, merged from the per-tile outputs in this order
+TILE_OUTPUTS = {
+    'spatial_base': 'pin10, neighborhood_name, zone_class',
+    'parcel_route_distance': 'pin10, route',
+    'parcel_station': 'kind, station_id, pin10',
+    'parcel_transit_distance': 'pin10',
+    'parcel_assignment': 'pin10',
+}
+# Layers the spatial stage reads; each worker copies them, and the geography's areas, cut down to its tile plus margin
+TILE_LAYERS = ['zoning', 'transit_stops', 'bus_routes']
+# Per-feature key for every layer in _feature_hashes; a refresh diffs (key, geometry hash) against the last build.
+# High-frequency status is part of a route's key so a new GTFS feed reaches the parcels along the routes it changed
+FEATURE_KEYS = {
+    'parcels': "CAST(pin10 AS VARCHAR)",
+    'areas': "area_name",
+    'zoning': "zone_class",
+    'transit_stops': "''",
+    'bus_routes': "CAST(route AS VARCHAR) || CASE WHEN CAST(route AS VARCHAR) IN (SELECT route FROM hf_routes) THEN ':hf' ELSE '' END",
+}
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+def tile_dir(config):
+    return config.get('spatial_engine', {}).get('tile_dir', 'data/tiles')
+
+def refresh_dir(config):
+    return os.path.join(tile_dir(config), '_refresh')
+
+def tile_path(config, table_name, tile, out_dir=None):
+    return os.path.join(out_dir or tile_dir(config), table_name, f"tile_{tile[0]}_{tile[1]}.parquet")
+
+def tile_expr(tile_size):
+    return f"""CAST(floor((xmin + xmax) / 2 / {tile_size}) AS INTEGER) AS tx,
+               CAST(floor((ymin + ymax) / 2 / {tile_size}) AS INTEGER) AS ty"""
+
+def list_tiles(con, tile_size, where="true"):
+    # Parcels belong to the tile holding their bbox centre, so every parcel is computed exactly once
+    return [tuple(r) for r in con.execute(f"""
+        SELECT DISTINCT {tile_expr(tile_size)}
+        FROM parcels WHERE geom_3435 IS NOT NULL AND {where}
+        ORDER BY 1, 2
+    """).fetchall()]
+
+def worker_count(config):
+    return config.get('spatial_engine', {}).get('workers') or os.cpu_count() or 1
+
+def worker_connection(config, threads):
+    # Workers read the database through a read-only attach and write their tables into a private in-memory catalog;
+    # search_path puts the in-memory views first so the shared SQL sees only this tile
+    con = duckdb.connect()
+    con.execute("LOAD spatial")
+    con.execute(f"SET threads = {threads}")
+    resources.configure(con, config, worker_count(config), f"workers/{os.getpid()}")
+    con.execute(f"ATTACH '{config['database']['file_name']}' AS src (READ_ONLY)")
+    con.execute("SET search_path = 'memory.main,src.main'")
+    return con
+
+def window(layer, x0, y0, x1, y1):
+    # The features whose bbox overlaps the box. A lone && against a constant envelope is answered from the layer's
+    # RTREE index; any further predicate in the same WHERE turns the plan back into a sequential scan, so callers
+    # filter the copied window instead
+    return f"SELECT * FROM src.main.{layer} WHERE geom_3435 && ST_MakeEnvelope({x0}, {y0}, {x1}, {y1})"
+
+def run_tile(config, tile, is_sandbox, refresh, threads):
+    t0 = time.time()
+    settings = config.get('spatial_engine', {})
+    tile_size = float(settings.get('tile_size_feet', 10000))
+    margin = float(config.get('transit', {}).get('max_radius_feet', 2640))
+    x0, y0 = tile[0] * tile_size, tile[1] * tile_size
+    out_dir = refresh_dir(config) if refresh else None
+    # A refresh only recomputes the parcels listed in _spatial_refresh
+    only_pins = "AND pin10 IN (SELECT pin10 FROM src.main._spatial_refresh)" if refresh else ""
+
+    con = worker_connection(config, threads)
+    try:
+        con.execute(f"CREATE TABLE _tile_window AS {window('parcels', x0, y0, x0 + tile_size, y0 + tile_size)}")
+        con.execute(f"""
+            CREATE TABLE parcels AS SELECT * FROM _tile_window
+            WHERE (xmin + xmax) / 2 >= {x0} AND (xmin + xmax) / 2 < {x0 + tile_size}
+              AND (ymin + ymax) / 2 >= {y0} AND (ymin + ymax) / 2 < {y0 + tile_size}
+              {only_pins}
+        """)
+        con.execute("DROP TABLE _tile_window")
+        extent = con.execute("SELECT MIN(xmin), MIN(ymin), MAX(xmax), MAX(ymax) FROM parcels").fetchone()
+        if extent[0] is None:
+            for table_name in TILE_OUTPUTS:
+                if os.path.exists(tile_path(config, table_name, tile, out_dir)):
+                    os.remove(tile_path(config, table_name, tile, out_dir))
+            return {'tile': tile, 'rows': 0, 'seconds': time.time() - t0, 'peak': resources.peak_bytes()}
+        bx0, by0, bx1, by1 = extent[0] - margin, extent[1] - margin, extent[2] + margin, extent[3] + margin
+        for layer in [*TILE_LAYERS, geography.table(config), 'transit_buffers']:
+            con.execute(f"CREATE TABLE {layer} AS {window(layer, bx0, by0, bx1, by1)}")
+        con.execute(f"CREATE VIEW areas AS {geography.areas_query(config)}")
+
+        walk = walk_network.is_enabled(config) and con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = 'src' AND table_name = 'parcel_walk_distance'").fetchone()[0] > 0
+        with open('sql/01_spatial_joins.sql', 'r') as f:
+            template = Template(f.read())
+        con.execute(template.render(is_sandbox=is_sandbox, files=config['files'], walk_network=walk,
+                                    default_zone_class=geography.default_zone_class(config),
+                                    **config.get('transit', {'max_radius_feet': 2640})))
+
+        for table_name in TILE_OUTPUTS:
+            out = tile_path(config, table_name, tile, out_dir)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            con.execute(f"COPY memory.main.{table_name} TO '{out}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)")
+            os.replace(out + '.tmp', out)
+        rows = con.execute("SELECT COUNT(*) FROM memory.main.spatial_base").fetchone()[0]
+        return {'tile': tile, 'rows': rows, 'seconds': time.time() - t0, 'peak': resources.peak_bytes()}
+    finally:
+        con.close()
+
+def merge_tiles(con, config):
+    for table_name, order in TILE_OUTPUTS.items():
+        files = os.path.join(tile_dir(config), table_name, 'tile_*.parquet')
+        if not glob.glob(files):
+            continue
+        # Sorted so the merged table is identical however the tiles were scheduled
+        con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM read_parquet('{files}') ORDER BY {order}")
+
+def replace_rows(con, config):
+    # Rows of the parcels in _spatial_refresh are swapped for the recomputed ones; parcels that no longer qualify
+    # (or no longer exist) simply lose their rows
+    for table_name in TILE_OUTPUTS:
+        con.execute(f"DELETE FROM {table_name} WHERE pin10 IN (SELECT pin10 FROM _spatial_refresh)")
+        files = os.path.join(refresh_dir(config), table_name, 'tile_*.parquet')
+        if glob.glob(files):
+            con.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM read_parquet('{files}')")
+
+def build_mode(con, config, is_sandbox):
+    walk = 'straight'
+    if walk_network.is_enabled(config) and 'parcel_walk_distance' in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        walk = con.execute("SELECT ANY_VALUE(version) FROM parcel_walk_distance").fetchone()[0]
+    return f"{'sandbox' if is_sandbox else 'all'}:{config.get('transit', {}).get('max_radius_feet', 2640)}:{walk}:{geography.mode_key(config)}"
+
+def feature_query(config, mode):
+    sources = {'areas': f"({geography.areas_query(config)})"}
+    layers = [f"""
+        SELECT '{layer}' AS layer, {key} AS feature, md5(ST_AsHEXWKB(geom_3435)) AS geom_hash, xmin, ymin, xmax, ymax
+        FROM {sources.get(layer, layer)} WHERE geom_3435 IS NOT NULL
+    """ for layer, key in FEATURE_KEYS.items()]
+    # Sandbox, radius, walking-network and geography settings change every parcel's result, so they are recorded
+    # alongside the features
+    layers.append(f"SELECT '_mode', '{mode}', NULL, NULL, NULL, NULL, NULL")
+    return ' UNION ALL '.join(layers)
+
+def save_feature_hashes(con, config, mode):
+    con.execute(f"CREATE OR REPLACE TABLE _feature_hashes AS {feature_query(config, mode)}")
+
+def mark_changed_parcels(con, config, mode):
+    margin = float(config.get('transit', {}).get('max_radius_feet', 2640))
+    con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _current_features AS {feature_query(config, mode)}")
+    con.execute("""
+        CREATE OR REPLACE TEMPORARY TABLE _changed_features AS
+        (SELECT * FROM _current_features EXCEPT SELECT * FROM _feature_hashes)
+        UNION ALL
+        (SELECT * FROM _feature_hashes EXCEPT SELECT * FROM _current_features)
+    """)
+    changed = dict(con.execute("SELECT layer, COUNT(*) FROM _changed_features GROUP BY 1").fetchall())
+    # Both the old and the new version of a changed feature are in _changed_features, so their bboxes cover the
+    # parcels that gained or lost it; transit reaches max_radius_feet past its bbox
+    con.execute(f"""
+        CREATE OR REPLACE TABLE _spatial_refresh AS
+        SELECT CAST(feature AS BIGINT) AS pin10 FROM _changed_features WHERE layer = 'parcels'
+        UNION
+        SELECT p.pin10 FROM parcels p
+        JOIN _changed_features c ON c.layer IN ('areas', 'zoning')
+            AND p.xmax >= c.xmin AND p.xmin <= c.xmax AND p.ymax >= c.ymin AND p.ymin <= c.ymax
+        UNION
+        SELECT p.pin10 FROM parcels p
+        JOIN _changed_features c ON c.layer IN ('transit_stops', 'bus_routes')
+            AND p.xmax >= c.xmin - {margin} AND p.xmin <= c.xmax + {margin}
+            AND p.ymax >= c.ymin - {margin} AND p.ymin <= c.ymax + {margin}
+    """)
+    con.execute("DROP TABLE _current_features")
+    con.execute("DROP TABLE _changed_features")
+    return changed
+
+def map_tiles(config, fn, tiles, *args):
+    # fn(config, tile, *args, threads) runs once per tile in a spawned worker; threads and memory are split so workers
+    # don't oversubscribe, and a tile that outgrows its share spills to disk
+    workers = worker_count(config)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(fn, config, tile, *args, threads) for tile in tiles]
+            for f in as_completed(futures):
+                results.append(f.result())
+    finally:
+        resources.clear_temp(config, 'workers')
+    return results
+
+def run_tiles(config, tiles, is_sandbox, refresh=False):
+    return map_tiles(config, run_tile, tiles, is_sandbox, refresh)
+
+def refresh_tiles(config, is_sandbox, tiles):
+    # Recomputes the parcels already listed in _spatial_refresh, grouped by tile so layers are cut down as usual
+    shutil.rmtree(refresh_dir(config), ignore_errors=True)
+    results = run_tiles(config, tiles, is_sandbox, refresh=True)
+    con = duckdb.connect(config['database']['file_name'])
+    con.execute("LOAD spatial")
+    resources.configure(con, config)
+    replace_rows(con, config)
+    save_feature_hashes(con, config, build_mode(con, config, is_sandbox))
+    con.execute("DROP TABLE _spatial_refresh")
+    con.close()
+    shutil.rmtree(refresh_dir(config), ignore_errors=True)
+    return results
+
+# Workers attach the database read-only, so the caller must not hold a write connection while this runs
+def build_spatial_base(config, is_sandbox=False, only_tile=None):
+    tile_size = float(config.get('spatial_engine', {}).get('tile_size_feet', 10000))
+
+    if only_tile is not None:
+        con = duckdb.connect(config['database']['file_name'])
+        con.execute(f"""
+            CREATE OR REPLACE TABLE _spatial_refresh AS
+            SELECT pin10 FROM (SELECT pin10, {tile_expr(tile_size)} FROM parcels WHERE geom_3435 IS NOT NULL)
+            WHERE tx = {only_tile[0]} AND ty = {only_tile[1]}
+        """)
+        con.close()
+        return refresh_tiles(config, is_sandbox, [only_tile])
+
+    con = duckdb.connect(config['database']['file_name'], read_only=True)
+    tiles = list_tiles(con, tile_size)
+    con.close()
+    shutil.rmtree(tile_dir(config), ignore_errors=True)
+    results = run_tiles(config, tiles, is_sandbox)
+
+    con = duckdb.connect(config['database']['file_name'])
+    con.execute("LOAD spatial")
+    resources.configure(con, config)
+    merge_tiles(con, config)
+    save_feature_hashes(con, config, build_mode(con, config, is_sandbox))
+    con.close()
+    return results
+
+def refresh_spatial_base(config, is_sandbox=False):
+    # Falls back to a full build when there is nothing to diff against or the build settings changed
+    con = duckdb.connect(config['database']['file_name'])
+    con.execute("LOAD spatial")
+    resources.configure(con, config)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if '_feature_hashes' not in tables or any(t not in tables for t in TILE_OUTPUTS):
+        con.close()
+        return build_spatial_base(config, is_sandbox), None
+    changed = mark_changed_parcels(con, config, build_mode(con, config, is_sandbox))
+    if '_mode' in changed:
+        con.execute("DROP TABLE _spatial_refresh")
+        con.close()
+        return build_spatial_base(config, is_sandbox), None
+    parcels = con.execute("SELECT COUNT(*) FROM _spatial_refresh").fetchone()[0]
+    tile_size = float(config.get('spatial_engine', {}).get('tile_size_feet', 10000))
+    tiles = list_tiles(con, tile_size, "pin10 IN (SELECT pin10 FROM _spatial_refresh)")
+    con.close()
+    results = refresh_tiles(config, is_sandbox, tiles)
+    return results, {'features': changed, 'parcels': parcels}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild spatial_base tile by tile")
+    parser.add_argument('--tile', help="Recompute a single tile given as X,Y in place (see data/tiles/)")
+    parser.add_argument('--refresh', action='store_true', help="Recompute only parcels affected by layer changes since the last build")
+    parser.add_argument('--sandbox', action='store_true', help="Only the 4 sandbox neighborhoods")
+    args = parser.parse_args()
+
+    config = load_config()
+    t0 = time.time()
+    only_tile = tuple(int(v) for v in args.tile.split(',')) if args.tile else None
+    if args.refresh:
+        results, delta = refresh_spatial_base(config, is_sandbox=args.sandbox)
+        if delta:
+            print(f"🔁 {sum(delta['features'].values()):,} changed features -> {delta['parcels']:,} parcels to recompute")
+    else:
+        results = build_spatial_base(config, is_sandbox=args.sandbox, only_tile=only_tile)
+    rows = sum(r['rows'] for r in results)
+    print(f"✅ Rebuilt {len(results)} tile(s), {rows:,} spatial_base rows in {time.time() - t0:.1f}s")
@@ -0,0 +1,13 @@
+CREATE OR REPLACE TABLE addresses AS
+SELECT CAST(ROW_NUMBER() OVER (ORDER BY address) AS INTEGER) as address_id, address
+FROM (
+    SELECT DISTINCT REPLACE(prop_address_full, ' REAR', '') as address
+    FROM parcel_addresses
+    WHERE prop_address_full IS NOT NULL
+);
+
+CREATE OR REPLACE TABLE parcel_addresses AS
+WITH pa AS (SELECT COLUMNS(c -> c != 'address_id') FROM parcel_addresses)
+SELECT pa.*, a.address_id
+FROM pa
+LEFT JOIN addresses a ON REPLACE(pa.prop_address_full, ' REAR', '') = a.address;
@@ -1,54 +1,170 @@
-CREATE OR REPLACE TABLE spatial_base AS
+-- Each parcel gets exactly one neighborhood (community area, or municipality in county mode) and one zone. Fast path: the polygon holding the parcel's interior point,
+-- when the parcel lies entirely within it. Parcels straddling a boundary take the polygon they overlap most
+CREATE OR REPLACE TEMPORARY TABLE parcel_points AS
+SELECT pin10, geom_3435, xmin, ymin, xmax, ymax, ST_PointOnSurface(geom_3435) as interior
+FROM parcels
+WHERE geom_3435 IS NOT NULL AND pin10 IS NOT NULL;
+
+CREATE OR REPLACE TABLE parcel_assignment AS
 WITH nbhds AS (
-    SELECT geom, ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, UPPER(community) as neighborhood_name
-    FROM ST_Read('data/neighborhoods.geojson')
-    {% if is_sandbox %}
-    WHERE UPPER(community) IN ('LINCOLN PARK', 'LAKE VIEW', 'ASHBURN', 'AUSTIN')
-    {% endif %}
+    SELECT geom_3435, xmin, ymin, xmax, ymax, area_name as neighborhood_name
+    FROM areas
+),
+zones AS (
+    SELECT geom_3435, xmin, ymin, xmax, ymax, zone_class
+    FROM zoning
+),
+nbhd_home AS (
+    -- Label and flag from the same polygon: where the interior point lies in overlapping polygons, one holding the whole parcel wins
+    SELECT pin10, ARG_MIN(neighborhood_name, (NOT inside, neighborhood_name)) as neighborhood_name, BOOL_OR(inside) as inside
+    FROM (
+        SELECT p.pin10, n.neighborhood_name, ST_Within(p.geom_3435, n.geom_3435) as inside
+        FROM parcel_points p
+        JOIN nbhds n ON ST_Within(p.interior, n.geom_3435)
+    )
+    GROUP BY 1
 ),
-step1_parcels AS (
-    SELECT p.pin10, ST_Transform(p.geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, n.neighborhood_name
+nbhd_edge AS (
+    SELECT p.pin10, ARG_MAX(n.neighborhood_name, ST_Area(ST_Intersection(p.geom_3435, n.geom_3435))) as neighborhood_name,
+           COUNT(*) as candidates
+    FROM parcel_points p
+    JOIN nbhds n ON p.xmax >= n.xmin AND p.xmin <= n.xmax AND p.ymax >= n.ymin AND p.ymin <= n.ymax
+        AND ST_Intersects(p.geom_3435, n.geom_3435)
+    WHERE NOT EXISTS (SELECT 1 FROM nbhd_home h WHERE h.pin10 = p.pin10 AND h.inside)
+    GROUP BY 1
+),
+zone_home AS (
+    SELECT pin10, ARG_MIN(zone_class, (NOT inside, zone_class)) as zone_class, BOOL_OR(inside) as inside
+    FROM (
+        SELECT p.pin10, z.zone_class, ST_Within(p.geom_3435, z.geom_3435) as inside
+        FROM parcel_points p
+        JOIN zones z ON ST_Within(p.interior, z.geom_3435)
+    )
+    GROUP BY 1
+),
+zone_edge AS (
+    SELECT p.pin10, ARG_MAX(z.zone_class, ST_Area(ST_Intersection(p.geom_3435, z.geom_3435))) as zone_class,
+           -- Only target zones duplicated rows under the old per-polygon joins, so only they count towards the report
+           COUNT(*) FILTER (WHERE z.zone_class SIMILAR TO '(RS|RT|RM|B|C).*') as candidates
+    FROM parcel_points p
+    JOIN zones z ON p.xmax >= z.xmin AND p.xmin <= z.xmax AND p.ymax >= z.ymin AND p.ymin <= z.ymax
+        AND ST_Intersects(p.geom_3435, z.geom_3435)
+    WHERE NOT EXISTS (SELECT 1 FROM zone_home h WHERE h.pin10 = p.pin10 AND h.inside)
+    GROUP BY 1
+)
+SELECT p.pin10,
+       CASE WHEN nh.inside THEN nh.neighborhood_name ELSE ne.neighborhood_name END as neighborhood_name,
+       CASE WHEN nh.inside THEN 'interior' ELSE 'area' END as neighborhood_method,
+       COALESCE(ne.candidates, 1) as neighborhood_candidates,
+       {% if default_zone_class %}
+       -- Outside the Chicago zoning layer (the suburbs, in county mode) parcels take the configured stand-in zone
+       CASE WHEN zh.inside THEN zh.zone_class ELSE COALESCE(ze.zone_class, '{{ default_zone_class }}') END as zone_class,
+       {% else %}
+       CASE WHEN zh.inside THEN zh.zone_class ELSE ze.zone_class END as zone_class,
+       {% endif %}
+       CASE WHEN zh.inside THEN 'interior' ELSE 'area' END as zone_method,
+       COALESCE(ze.candidates, CASE WHEN zh.zone_class SIMILAR TO '(RS|RT|RM|B|C).*' THEN 1 ELSE 0 END) as zone_candidates
+FROM (SELECT DISTINCT pin10 FROM parcel_points) p
+LEFT JOIN nbhd_home nh ON p.pin10 = nh.pin10 AND nh.inside
+LEFT JOIN nbhd_edge ne ON p.pin10 = ne.pin10
+LEFT JOIN zone_home zh ON p.pin10 = zh.pin10 AND zh.inside
+LEFT JOIN zone_edge ze ON p.pin10 = ze.pin10;
+
+CREATE OR REPLACE TEMPORARY TABLE base_parcels AS
+SELECT p.pin10, p.geom_3435, p.xmin, p.ymin, p.xmax, p.ymax, a.neighborhood_name, ST_Area(p.geom_3435) as area_sqft, a.zone_class
+FROM parcel_points p
+JOIN parcel_assignment a ON p.pin10 = a.pin10
+WHERE a.neighborhood_name IS NOT NULL
+  AND a.zone_class SIMILAR TO '(RS|RT|RM|B|C).*'
+  {% if is_sandbox %}
+  AND a.neighborhood_name IN ('LINCOLN PARK', 'LAKE VIEW', 'ASHBURN', 'AUSTIN')
+  {% endif %};
+
+-- Exact distance from each parcel to every bus route within max_radius_feet and to its nearest rail station.
+-- Ring flags are comparisons against these, so a new radius policy needs no geometry work.
+-- Candidates come from the prebuilt transit_buffers, so each route and station is buffered once per transit version
+CREATE OR REPLACE TABLE parcel_route_distance AS
+WITH parcels AS (SELECT DISTINCT pin10, geom_3435 FROM base_parcels)
+SELECT p.pin10, tb.route, MIN(ST_Distance(p.geom_3435, b.geom_3435)) as distance
+FROM parcels p
+JOIN transit_buffers tb ON tb.category = 'route' AND tb.radius_feet = {{ max_radius_feet }} AND ST_Intersects(p.geom_3435, tb.geom_3435)
+JOIN bus_routes b ON CAST(b.route AS VARCHAR) = tb.route AND ST_DWithin(p.geom_3435, b.geom_3435, {{ max_radius_feet }})
+GROUP BY 1, 2;
+
+-- Many-to-many parcel -> rail station (platforms grouped by map_id) / BRT or HF route attribution within max_radius_feet.
+-- ring is the smallest policy ring (1320 or 2640 ft) the parcel falls in, NULL beyond 2640
+CREATE OR REPLACE TABLE parcel_station AS
+WITH parcels AS (SELECT DISTINCT pin10, geom_3435 FROM base_parcels),
+near_rail AS (
+    SELECT p.pin10, p.geom_3435
     FROM parcels p
-    JOIN nbhds n ON ST_Intersects(p.geom, n.geom)
-    WHERE p.geom IS NOT NULL
-),
-target_zones AS (
-    SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435, zone_class
-    FROM zoning WHERE zone_class SIMILAR TO '(RS|RT|RM|B|C).*'
-),
-base_parcels AS (
-    SELECT p.pin10, p.geom_3435, p.neighborhood_name, ST_Area(p.geom_3435) as area_sqft, z.zone_class
-    FROM step1_parcels p
-    JOIN target_zones z ON ST_Intersects(p.geom_3435, z.geom_3435)
-),
-projected_transit AS (SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435 FROM transit_stops),
-projected_bus_all AS (SELECT CAST(route AS VARCHAR) as route, ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435 FROM bus_routes),
-projected_bus_hf AS (SELECT geom_3435 FROM projected_bus_all WHERE route IN ('4', '9', '12', '14', 'J14', '20', '34', '47', '49', '53', '54', '55', '60', '63', '66', '72', '77', '79', '81', '82', '95')),
-projected_bus_brt AS (SELECT geom_3435 FROM projected_bus_all WHERE route = 'J14'),
+    JOIN transit_buffers tb ON tb.category = 'rail' AND tb.radius_feet = {{ max_radius_feet }} AND ST_Intersects(p.geom_3435, tb.geom_3435)
+),
+stations AS (
+    SELECT p.pin10, 'rail' as kind, CAST(t.map_id AS VARCHAR) as station_id, MIN(t.station_name) as station_name,
+           MIN(ST_Distance(p.geom_3435, t.geom_3435)) as distance
+    FROM near_rail p
+    JOIN transit_stops t ON ST_DWithin(p.geom_3435, t.geom_3435, {{ max_radius_feet }})
+    GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT pin10, 'brt', route, 'Route ' || route, distance FROM parcel_route_distance WHERE route = 'J14'
+    UNION ALL
+    SELECT pin10, 'hf', route, 'Route ' || route, distance FROM parcel_route_distance WHERE route IN (SELECT route FROM hf_routes)
+)
+SELECT pin10, kind, station_id, station_name, distance,
+       CASE WHEN distance <= 1320 THEN 1320 WHEN distance <= 2640 THEN 2640 END as ring
+FROM stations;
 
-train_1320 AS (SELECT DISTINCT ep.pin10 FROM base_parcels ep JOIN projected_transit t ON ST_Intersects(ep.geom_3435, ST_Buffer(t.geom_3435, 1320))),
-train_2640 AS (SELECT DISTINCT ep.pin10 FROM base_parcels ep JOIN projected_transit t ON ST_Intersects(ep.geom_3435, ST_Buffer(t.geom_3435, 2640))),
-brt_1320 AS (SELECT DISTINCT ep.pin10 FROM base_parcels ep JOIN projected_bus_brt b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 1320))),
-brt_2640 AS (SELECT DISTINCT ep.pin10 FROM base_parcels ep JOIN projected_bus_brt b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 2640))),
-hf_1320 AS (SELECT DISTINCT ep.pin10 FROM base_parcels ep JOIN projected_bus_hf b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 1320))),
+CREATE OR REPLACE TABLE parcel_transit_distance AS
+WITH parcels AS (SELECT DISTINCT pin10, geom_3435 FROM base_parcels),
+rail AS (
+    SELECT pin10, MIN(distance) as rail_dist
+    FROM parcel_station WHERE kind = 'rail'
+    GROUP BY 1
+),
+bus AS (
+    SELECT pin10,
+           MIN(CASE WHEN route = 'J14' THEN distance END) as brt_dist,
+           MIN(CASE WHEN route IN (SELECT route FROM hf_routes) THEN distance END) as hf_dist,
+           COUNT(*) as routes_within_max
+    FROM parcel_route_distance
+    GROUP BY 1
+)
+SELECT p.pin10, r.rail_dist, b.brt_dist, b.hf_dist, COALESCE(b.routes_within_max, 0) as routes_within_max
+FROM (SELECT DISTINCT pin10 FROM parcels) p
+LEFT JOIN rail r ON p.pin10 = r.pin10
+LEFT JOIN bus b ON p.pin10 = b.pin10;
 
+-- With walk_network enabled, parcels on the street network use walking distances for the rail/BRT/HF flags;
+-- parcels with no street within snap_feet keep their straight-line distances
+CREATE OR REPLACE TABLE spatial_base AS
+WITH dist AS (
+    {% if walk_network %}
+    SELECT d.pin10,
+           CASE WHEN w.pin10 IS NULL THEN d.rail_dist ELSE w.rail_walk END as rail_dist,
+           CASE WHEN w.pin10 IS NULL THEN d.brt_dist ELSE w.brt_walk END as brt_dist,
+           CASE WHEN w.pin10 IS NULL THEN d.hf_dist ELSE w.hf_walk END as hf_dist
+    FROM parcel_transit_distance d
+    LEFT JOIN parcel_walk_distance w ON d.pin10 = w.pin10
+    {% else %}
+    SELECT pin10, rail_dist, brt_dist, hf_dist FROM parcel_transit_distance
+    {% endif %}
+),
 bus_counts AS (
-    SELECT ep.pin10, COUNT(DISTINCT b.route) as all_bus_count, COUNT(DISTINCT CASE WHEN b.route IN ('4', '9', '12', '14', 'J14', '20', '34', '47', '49', '53', '54', '55', '60', '63', '66', '72', '77', '79', '81', '82', '95') THEN b.route END) as hf_bus_count
-    FROM base_parcels ep JOIN projected_bus_all b ON ST_Intersects(ep.geom_3435, ST_Buffer(b.geom_3435, 1320)) GROUP BY ep.pin10
+    SELECT pin10, COUNT(*) as all_bus_count, COUNT(CASE WHEN route IN (SELECT route FROM hf_routes) THEN 1 END) as hf_bus_count
+    FROM parcel_route_distance WHERE distance <= 1320 GROUP BY 1
 )
-
 SELECT ep.*,
-       CASE WHEN t13.pin10 IS NOT NULL THEN true ELSE false END as is_train_1320,
-       CASE WHEN t26.pin10 IS NOT NULL THEN true ELSE false END as is_train_2640,
-       CASE WHEN b13.pin10 IS NOT NULL THEN true ELSE false END as is_brt_1320,
-       CASE WHEN b26.pin10 IS NOT NULL THEN true ELSE false END as is_brt_2640,
-       CASE WHEN h13.pin10 IS NOT NULL THEN true ELSE false END as is_hf_1320,
+       COALESCE(d.rail_dist <= 1320, false) as is_train_1320,
+       COALESCE(d.rail_dist <= 2640, false) as is_train_2640,
+       COALESCE(d.brt_dist <= 1320, false) as is_brt_1320,
+       COALESCE(d.brt_dist <= 2640, false) as is_brt_2640,
+       COALESCE(d.hf_dist <= 1320, false) as is_hf_1320,
        COALESCE(bc.all_bus_count, 0) as all_bus_count,
        COALESCE(bc.hf_bus_count, 0) as hf_bus_count
 FROM base_parcels ep
-         LEFT JOIN train_1320 t13 ON ep.pin10 = t13.pin10
-         LEFT JOIN train_2640 t26 ON ep.pin10 = t26.pin10
-         LEFT JOIN brt_1320 b13 ON ep.pin10 = b13.pin10
-         LEFT JOIN brt_2640 b26 ON ep.pin10 = b26.pin10
-         LEFT JOIN hf_1320 h13 ON ep.pin10 = h13.pin10
+         LEFT JOIN dist d ON ep.pin10 = d.pin10
          LEFT JOIN bus_counts bc ON ep.pin10 = bc.pin10;
+
+DROP TABLE base_parcels;
+DROP TABLE parcel_points;
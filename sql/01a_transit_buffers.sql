@@ -0,0 +1,19 @@
+-- Built once per version of the transit layers (see calculate_parcels.build_transit_buffers).
+-- The candidate prefilters of the distance joins in 01: one dissolved buffer of every rail station and one buffer per
+-- bus route, both at max_radius_feet. Ring flags and BRT/HF status come from the exact distances, not from buffers.
+-- ST_Buffer draws an inscribed polygon; widening the radius by 1/cos(pi/32) makes each buffer cover the true circle,
+-- so joining against it never drops a parcel that an exact ST_DWithin would keep
+CREATE OR REPLACE TABLE transit_buffers AS
+WITH features AS (
+    SELECT 'rail' as category, NULL::VARCHAR as route, geom_3435 FROM transit_stops
+    UNION ALL
+    SELECT 'route', CAST(route AS VARCHAR), geom_3435 FROM bus_routes
+)
+SELECT category, route, {{ radius }} as radius_feet,
+       ST_Union_Agg(ST_Buffer(geom_3435, {{ radius }} / cos(pi() / 32))) as geom_3435,
+       '{{ version }}' as version
+FROM features
+WHERE geom_3435 IS NOT NULL
+GROUP BY category, route;
+
+CREATE INDEX transit_buffers_geom_3435_rtree ON transit_buffers USING RTREE (geom_3435);
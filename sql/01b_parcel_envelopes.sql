@@ -0,0 +1,49 @@
+-- Lot shape for the parcels in envelope_todo. Frontage and depth are the short and long sides of the minimum rotated
+-- rectangle. A side is shared when another parcel lies within adjacency_feet of its midpoint; a mid-block lot leaves at
+-- most its front and rear (opposite sides) open, so two open neighbouring sides make a corner lot.
+-- The envelope is the lot buffered inward by its setback, less a corner lot's side-street yard (corner_setback_feet
+-- along its depth)
+CREATE OR REPLACE TEMPORARY TABLE envelope_rects AS
+SELECT pin10, geom_hash, params, setback_feet, geom_3435,
+       ST_ExteriorRing(ST_MinimumRotatedRectangle(geom_3435)) as ring
+FROM envelope_todo;
+
+-- Each rectangle side's midpoint, pulled onto the lot for irregular shapes. Materialized so the neighbour test below
+-- plans as a spatial join
+CREATE OR REPLACE TEMPORARY TABLE envelope_midpoints AS
+SELECT pin10, side,
+       ST_ClosestPoint(geom_3435, ST_Point((ST_X(ST_PointN(ring, side)) + ST_X(ST_PointN(ring, side + 1))) / 2,
+                                           (ST_Y(ST_PointN(ring, side)) + ST_Y(ST_PointN(ring, side + 1))) / 2)) as mid
+FROM envelope_rects, (SELECT CAST(UNNEST([1, 2, 3, 4]) AS INTEGER) as side);
+
+-- Every parcel near a midpoint, the lot itself included; filtering it out inside the join makes the planner drop the
+-- spatial join for a nested loop
+CREATE OR REPLACE TEMPORARY TABLE envelope_neighbours AS
+SELECT m.pin10, m.side, n.pin10 as neighbour
+FROM envelope_midpoints m
+JOIN parcels n ON ST_DWithin(m.mid, n.geom_3435, {{ adjacency_feet }});
+
+CREATE OR REPLACE TABLE new_envelopes AS
+WITH shared AS (
+    SELECT pin10, LIST(DISTINCT side) as sides
+    FROM envelope_neighbours
+    WHERE neighbour != pin10
+    GROUP BY 1
+),
+shapes AS (
+    SELECT r.pin10, r.geom_hash, r.params, r.setback_feet,
+           LEAST(ST_Distance(ST_PointN(r.ring, 1), ST_PointN(r.ring, 2)), ST_Distance(ST_PointN(r.ring, 2), ST_PointN(r.ring, 3))) as frontage_feet,
+           GREATEST(ST_Distance(ST_PointN(r.ring, 1), ST_PointN(r.ring, 2)), ST_Distance(ST_PointN(r.ring, 2), ST_PointN(r.ring, 3))) as depth_feet,
+           len(COALESCE(s.sides, [])) as shared_sides,
+           list_bool_or([NOT list_contains(COALESCE(s.sides, []), i) AND NOT list_contains(COALESCE(s.sides, []), i % 4 + 1) FOR i IN [1, 2, 3, 4]]) as is_corner,
+           COALESCE(ST_Area(ST_Buffer(r.geom_3435, -r.setback_feet)), 0) as setback_sqft
+    FROM envelope_rects r
+    LEFT JOIN shared s ON r.pin10 = s.pin10
+)
+SELECT pin10, geom_hash, params, setback_feet, frontage_feet, depth_feet, shared_sides, is_corner,
+       CASE WHEN is_corner THEN GREATEST(setback_sqft - {{ corner_setback_feet }} * depth_feet, 0) ELSE setback_sqft END as envelope_sqft
+FROM shapes;
+
+DROP TABLE envelope_neighbours;
+DROP TABLE envelope_midpoints;
+DROP TABLE envelope_rects;
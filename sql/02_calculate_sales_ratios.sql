@@ -1,26 +1,27 @@
 CREATE OR REPLACE TABLE unified_properties AS
 WITH v_agg AS (
     SELECT
-        SUBSTR(REPLACE(CAST(pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        ANY_VALUE(CAST("class" AS VARCHAR)) as property_class,
+        pin10,
+        ANY_VALUE("class") as property_class,
         COUNT(pin) as tax_pin_count,
-        SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value,
-        SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value
+        SUM(certified_bldg) as bldg_value,
+        SUM(certified_land) as land_value
     FROM assessed_values
     GROUP BY 1
 ),
 rc_agg AS (
     SELECT
-        SUBSTR(REPLACE(CAST(pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        MAX(TRY_CAST(char_yrblt AS INT)) as char_yrblt,
-        SUM(TRY_CAST(char_bldg_sf AS DOUBLE)) as char_bldg_sf
+        pin10,
+        MAX(char_yrblt) as char_yrblt,
+        SUM(char_bldg_sf) as char_bldg_sf
     FROM res_characteristics
     GROUP BY 1
 ),
 pa_agg AS (
     SELECT
-        SUBSTR(REPLACE(CAST(pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        ANY_VALUE(CAST(prop_address_full AS VARCHAR)) as prop_address
+        pin10,
+        MIN(address_id) as address_id,
+        ARG_MIN(prop_address_full, address_id) as prop_address
     FROM parcel_addresses
     GROUP BY 1
 ),
@@ -48,19 +49,22 @@ assessor_joined AS (
         CASE WHEN rc.char_yrblt IS NULL OR rc.char_yrblt = 0 THEN 0 ELSE (2024 - rc.char_yrblt) END as building_age,
         COALESCE(rc.char_bldg_sf, 0.0) as existing_sqft,
         pa.prop_address,
+        pa.address_id,
+        e.envelope_sqft, e.frontage_feet, e.depth_feet, e.is_corner,
         (COALESCE(v.bldg_value, 0.0) / CASE WHEN v.property_class LIKE '2%' OR v.property_class LIKE '3%' OR v.property_class LIKE '9%' THEN 0.10 ELSE 0.25 END) as tot_bldg_value,
         (COALESCE(v.land_value, 0.0) / CASE WHEN v.property_class LIKE '2%' OR v.property_class LIKE '3%' OR v.property_class LIKE '9%' THEN 0.10 ELSE 0.25 END) as tot_land_value
     FROM spatial_base sb
     LEFT JOIN v_agg v ON sb.pin10 = v.pin10
     LEFT JOIN rc_agg rc ON sb.pin10 = rc.pin10
     LEFT JOIN pa_agg pa ON sb.pin10 = pa.pin10
+    LEFT JOIN parcel_envelopes e ON sb.pin10 = e.pin10
 ),
 
 clean_sales AS (
-    SELECT SUBSTR(REPLACE(CAST(pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-           TRY_CAST(sale_price AS DOUBLE) as sale_price
+    SELECT pin10,
+           sale_price
     FROM parcel_sales
-    WHERE TRY_CAST(sale_price AS DOUBLE) > 20000
+    WHERE sale_price > 20000
 ),
 valid_ratios AS (
     SELECT vr_aj.neighborhood_name,
@@ -102,13 +106,20 @@ pin_level_values AS (
         END
 )
 
+-- Parcels sharing an address are assembled into one property; negating pin10 keeps unaddressed parcels apart from address ids.
+-- Per-property picks go to the lowest pin10 so the result doesn't depend on spatial_base row order (refreshed rows are appended)
 SELECT
-    COALESCE(REPLACE(prop_address, ' REAR', ''), pin10) as prop_id,
-    ANY_VALUE(geom_3435) as center_geom,
-    ANY_VALUE(neighborhood_name) as neighborhood_name,
-    ANY_VALUE(zone_class) as zone_class,
+    COALESCE(address_id, -pin10) as prop_id,
+    ARG_MIN(geom_3435, pin10) as center_geom,
+    ARG_MIN(neighborhood_name, pin10) as neighborhood_name,
+    ARG_MIN(zone_class, pin10) as zone_class,
     SUM(area_sqft) as area_sqft,
     COUNT(pin10) as parcels_combined,
+    -- Assembled lots are measured parcel by parcel, so the envelope keeps the setbacks between them (conservative)
+    SUM(envelope_sqft) as envelope_sqft,
+    SUM(frontage_feet) as frontage_feet,
+    MAX(depth_feet) as depth_feet,
+    BOOL_OR(is_corner) as is_corner,
 
     BOOL_OR(is_train_1320) as is_train_1320,
     BOOL_OR(is_train_2640) as is_train_2640,
@@ -118,13 +129,19 @@ SELECT
     MAX(all_bus_count) as all_bus_count,
     MAX(hf_bus_count) as hf_bus_count,
 
-    ARG_MAX(primary_prop_class, tot_bldg_value + tot_land_value) as primary_prop_class,
+    ARG_MAX(primary_prop_class, (tot_bldg_value + tot_land_value, -pin10)) as primary_prop_class,
     SUM(existing_units) as existing_units,
     MAX(building_age) as building_age,
     SUM(existing_sqft) as existing_sqft,
-    ANY_VALUE(prop_address) as prop_address,
+    ARG_MIN(prop_address, pin10) as prop_address,
     SUM(tot_bldg_value) as tot_bldg_value,
     SUM(tot_land_value) as tot_land_value,
-    ARG_MAX(market_correction_multiplier, tot_bldg_value + tot_land_value) as market_correction_multiplier
+    ARG_MAX(market_correction_multiplier, (tot_bldg_value + tot_land_value, -pin10)) as market_correction_multiplier
 FROM pin_level_values
-GROUP BY COALESCE(REPLACE(prop_address, ' REAR', ''), pin10);
+GROUP BY COALESCE(address_id, -pin10);
+
+-- Which property each parcel was assembled into, for attributing property-level results back to parcels
+CREATE OR REPLACE TABLE property_parcels AS
+SELECT sb.pin10, COALESCE(pa.address_id, -sb.pin10) as prop_id
+FROM spatial_base sb
+LEFT JOIN (SELECT pin10, MIN(address_id) as address_id FROM parcel_addresses GROUP BY 1) pa ON sb.pin10 = pa.pin10;
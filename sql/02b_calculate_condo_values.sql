@@ -1,46 +1,46 @@
 CREATE OR REPLACE TABLE dynamic_condo_values AS
 WITH flat_characteristics AS (
     SELECT
-        pin,
-        MAX(TRY_CAST(char_yrblt AS INT)) as yrblt,
-        MAX(TRY_CAST(char_bldg_sf AS DOUBLE)) as sqft
+        pin14,
+        MAX(char_yrblt) as yrblt,
+        MAX(char_bldg_sf) as sqft
     FROM res_characteristics
-    WHERE CAST(class AS VARCHAR) IN ('211', '212')
-    GROUP BY pin
+    WHERE class IN ('211', '212')
+    GROUP BY pin14
 ),
 condo_chars_clean AS (
     SELECT
-        pin,
-        MAX(TRY_CAST(year_built AS INT)) as yrblt,
-        MAX(NULLIF(TRY_CAST(unit_sf AS DOUBLE), 0)) as sqft
+        pin14,
+        MAX(year_built) as yrblt,
+        MAX(NULLIF(unit_sf, 0)) as sqft
     FROM condo_characteristics
-    GROUP BY pin
+    GROUP BY pin14
 ),
 recent_new_sales AS (
     SELECT
-        SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        TRY_CAST(s.sale_price AS DOUBLE) as sale_price,
+        s.pin10,
+        s.sale_price,
         f.sqft
     FROM parcel_sales s
-    JOIN flat_characteristics f ON s.pin = f.pin
+    JOIN flat_characteristics f ON s.pin14 = f.pin14
     WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
       AND f.yrblt >= 2018
       AND f.sqft > 400
-      AND TRY_CAST(s.sale_price AS DOUBLE) > 50000
+      AND s.sale_price > 50000
       AND s.is_multisale = FALSE
 
     UNION ALL
 
     SELECT
-        SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        TRY_CAST(s.sale_price AS DOUBLE) as sale_price,
+        s.pin10,
+        s.sale_price,
         c.sqft
     FROM parcel_sales s
-    JOIN condo_chars_clean c ON s.pin = c.pin
+    JOIN condo_chars_clean c ON s.pin14 = c.pin14
     WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
       AND c.yrblt >= 2018
       AND c.sqft > 400
-      AND TRY_CAST(s.sale_price AS DOUBLE) > 50000
+      AND s.sale_price > 50000
       AND s.is_multisale = FALSE
 ),
 filtered_sales AS (
@@ -98,14 +98,14 @@ citywide AS (
 -- TEARDOWN FLOOR PERCENTILES
 recent_teardown_sales AS (
     SELECT
-        SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) as pin10,
-        MAX(TRY_CAST(s.sale_price AS DOUBLE)) as sale_price
+        s.pin10,
+        MAX(s.sale_price) as sale_price
     FROM parcel_sales s
-    JOIN assessor_universe au ON SUBSTR(REPLACE(CAST(s.pin AS VARCHAR), '-', ''), 1, 10) = SUBSTR(LPAD(CAST(au.pin AS VARCHAR), 14, '0'), 1, 10)
+    JOIN assessor_universe au ON s.pin10 = au.pin10
     WHERE s.sale_date >= CURRENT_DATE - INTERVAL '2' YEAR
-      AND TRY_CAST(s.sale_price AS DOUBLE) > 20000
+      AND s.sale_price > 20000
       AND s.is_multisale = FALSE
-      AND CAST(au.class AS VARCHAR) IN ('202', '203', '204', '205', '206', '207', '208', '209', '210', '211', '212', '213', '214')
+      AND au.class IN ('202', '203', '204', '205', '206', '207', '208', '209', '210', '211', '212', '213', '214')
     GROUP BY 1
 ),
 teardown_with_area AS (
@@ -1,7 +1,7 @@
-CREATE OR REPLACE TABLE step5_pro_forma AS
+CREATE OR REPLACE TABLE {{ target_table }} AS
 WITH combined AS (
     SELECT
-        up.center_geom, up.neighborhood_name, up.area_sqft, up.zone_class, up.parcels_combined,
+        up.prop_id, up.center_geom, up.neighborhood_name, up.area_sqft, up.zone_class, up.parcels_combined,
         up.is_train_1320, up.is_train_2640, up.is_brt_1320, up.is_brt_2640, up.is_hf_1320, up.all_bus_count, up.hf_bus_count,
         COALESCE(up.existing_units, 0.0) as existing_units,
         COALESCE(up.primary_prop_class, 'UNKNOWN') as primary_prop_class,
@@ -11,13 +11,19 @@ WITH combined AS (
         COALESCE(up.existing_sqft, 0.0) as existing_sqft,
         up.prop_address,
         up.market_correction_multiplier,
+        up.frontage_feet, up.depth_feet, up.is_corner,
+        -- Too narrow for a multi-unit building: the upzoning scenarios add nothing
+        CASE WHEN up.frontage_feet < {{ min_frontage_feet }} THEN 0 ELSE 1 END as frontage_factor,
+        COALESCE(up.envelope_sqft, up.area_sqft) as envelope_sqft,
+        -- Floor area can't exceed the setback envelope stacked to the height limit, whatever the FAR allows
+        COALESCE(up.envelope_sqft, up.area_sqft) * {{ envelope_max_stories }} as max_envelope_gsf,
         COALESCE(dcv.condo_price_per_sqft, {{ default_condo_price_per_sqft }}) as condo_price_per_sqft,
         CASE WHEN up.neighborhood_name IN ('LINCOLN PARK', 'LAKE VIEW', 'NEAR NORTH SIDE', 'LOOP', 'NEAR WEST SIDE')
              THEN {{ const_cost_per_sqft_high }} ELSE {{ const_cost_per_sqft_low }} END as const_cost_per_sqft,
         COALESCE(dcv.acq_cost_floor_per_sqft, {{ default_acq_floor_per_sqft }}) as acq_cost_floor_per_sqft,
         {{ target_profit_margin }} as target_profit_margin,
         {{ min_unit_size_sqft }} as min_unit_size_sqft
-    FROM unified_properties up
+    FROM {{ source_table }} up
     LEFT JOIN dynamic_condo_values dcv ON up.neighborhood_name = dcv.neighborhood_name
 ),
 raw_capacities AS (
@@ -54,11 +60,11 @@ raw_capacities AS (
 capacities AS (
     SELECT *,
         cap_curr_raw as cap_curr,
-        GREATEST(cap_curr_raw, cap_pritzker_raw) as cap_pritzker,
-        GREATEST(cap_curr_raw, cap_pritzker_raw, cap_sb79_raw) as cap_sb79,
-        GREATEST(cap_curr_raw, cap_pritzker_raw, cap_train_raw) as cap_train_only,
-        GREATEST(cap_curr_raw, cap_pritzker_raw, cap_hf_raw) as cap_train_hf,
-        GREATEST(cap_curr_raw, cap_pritzker_raw, cap_combo_raw) as cap_train_combo,
+        GREATEST(cap_curr_raw, frontage_factor * cap_pritzker_raw) as cap_pritzker,
+        GREATEST(cap_curr_raw, frontage_factor * cap_pritzker_raw, frontage_factor * cap_sb79_raw) as cap_sb79,
+        GREATEST(cap_curr_raw, frontage_factor * cap_pritzker_raw, frontage_factor * cap_train_raw) as cap_train_only,
+        GREATEST(cap_curr_raw, frontage_factor * cap_pritzker_raw, frontage_factor * cap_hf_raw) as cap_train_hf,
+        GREATEST(cap_curr_raw, frontage_factor * cap_pritzker_raw, frontage_factor * cap_combo_raw) as cap_train_combo,
         (existing_units < 40) as pass_max_units,
         (building_age >= 35 OR (building_age = 0 AND tot_bldg_value < 250000)) as pass_age_value,
         (zone_class NOT IN ('OS', 'POS', 'PMD')) as pass_zoning_class,
@@ -80,45 +86,45 @@ capacities AS (
 ),
 financial_metrics AS (
     SELECT *,
-        (area_sqft * {{ far_current }}) as gsf_curr,
-        (area_sqft * {{ far_pritzker }}) as gsf_pritzker,
-        (area_sqft * CASE WHEN cap_sb79_raw > 0 THEN {{ far_sb79 }} ELSE {{ far_pritzker }} END) as gsf_sb79,
-        (area_sqft * CASE WHEN cap_train_raw > 0 THEN {{ far_train }} ELSE {{ far_pritzker }} END) as gsf_train,
-        (area_sqft * CASE WHEN cap_hf_raw > 0 THEN {{ far_hf }} ELSE {{ far_pritzker }} END) as gsf_hf,
-        (area_sqft * CASE WHEN cap_combo_raw > 0 THEN {{ far_combo }} ELSE {{ far_pritzker }} END) as gsf_combo,
+        LEAST(area_sqft * {{ far_current }}, max_envelope_gsf) as gsf_curr,
+        LEAST(area_sqft * {{ far_pritzker }}, max_envelope_gsf) as gsf_pritzker,
+        LEAST(area_sqft * CASE WHEN cap_sb79_raw > 0 THEN {{ far_sb79 }} ELSE {{ far_pritzker }} END, max_envelope_gsf) as gsf_sb79,
+        LEAST(area_sqft * CASE WHEN cap_train_raw > 0 THEN {{ far_train }} ELSE {{ far_pritzker }} END, max_envelope_gsf) as gsf_train,
+        LEAST(area_sqft * CASE WHEN cap_hf_raw > 0 THEN {{ far_hf }} ELSE {{ far_pritzker }} END, max_envelope_gsf) as gsf_hf,
+        LEAST(area_sqft * CASE WHEN cap_combo_raw > 0 THEN {{ far_combo }} ELSE {{ far_pritzker }} END, max_envelope_gsf) as gsf_combo,
 
-        ((area_sqft * {{ far_current }}) * CASE WHEN cap_curr <= 2 THEN 0.90
+        (LEAST(area_sqft * {{ far_current }}, max_envelope_gsf) * CASE WHEN cap_curr <= 2 THEN 0.90
                  WHEN cap_curr <= 4 THEN 0.75
                  WHEN cap_curr <= 9 THEN 0.78
                  WHEN cap_curr <= 19 THEN 0.80
                  ELSE 0.82 END
         ) as nra_curr,
 
-        ((area_sqft * {{ far_pritzker }}) * CASE WHEN cap_pritzker <= 2 THEN 0.90
+        (LEAST(area_sqft * {{ far_pritzker }}, max_envelope_gsf) * CASE WHEN cap_pritzker <= 2 THEN 0.90
                  WHEN cap_pritzker <= 6 THEN 0.87
                  WHEN cap_pritzker <= 15 THEN 0.85
                  ELSE 0.82 END
         ) as nra_pritzker,
 
-        ((area_sqft * CASE WHEN cap_sb79_raw > 0 THEN {{ far_sb79 }} ELSE {{ far_pritzker }} END) * CASE WHEN cap_sb79 <= 2 THEN 0.90
+        (LEAST(area_sqft * CASE WHEN cap_sb79_raw > 0 THEN {{ far_sb79 }} ELSE {{ far_pritzker }} END, max_envelope_gsf) * CASE WHEN cap_sb79 <= 2 THEN 0.90
                  WHEN cap_sb79 <= 6 THEN 0.87
                  WHEN cap_sb79 <= 15 THEN 0.85
                  ELSE 0.82 END
         ) as nra_sb79,
 
-        ((area_sqft * CASE WHEN cap_train_raw > 0 THEN {{ far_train }} ELSE {{ far_pritzker }} END) * CASE WHEN cap_train_only <= 2 THEN 0.90
+        (LEAST(area_sqft * CASE WHEN cap_train_raw > 0 THEN {{ far_train }} ELSE {{ far_pritzker }} END, max_envelope_gsf) * CASE WHEN cap_train_only <= 2 THEN 0.90
                  WHEN cap_train_only <= 6 THEN 0.87
                  WHEN cap_train_only <= 15 THEN 0.85
                  ELSE 0.82 END
         ) as nra_train,
 
-        ((area_sqft * CASE WHEN cap_hf_raw > 0 THEN {{ far_hf }} ELSE {{ far_pritzker }} END) * CASE WHEN cap_train_hf <= 2 THEN 0.90
+        (LEAST(area_sqft * CASE WHEN cap_hf_raw > 0 THEN {{ far_hf }} ELSE {{ far_pritzker }} END, max_envelope_gsf) * CASE WHEN cap_train_hf <= 2 THEN 0.90
                  WHEN cap_train_hf <= 6 THEN 0.87
                  WHEN cap_train_hf <= 15 THEN 0.85
                  ELSE 0.82 END
         ) as nra_hf,
 
-        ((area_sqft * CASE WHEN cap_combo_raw > 0 THEN {{ far_combo }} ELSE {{ far_pritzker }} END) * CASE WHEN cap_train_combo <= 2 THEN 0.90
+        (LEAST(area_sqft * CASE WHEN cap_combo_raw > 0 THEN {{ far_combo }} ELSE {{ far_pritzker }} END, max_envelope_gsf) * CASE WHEN cap_train_combo <= 2 THEN 0.90
                  WHEN cap_train_combo <= 6 THEN 0.87
                  WHEN cap_train_combo <= 15 THEN 0.85
                  ELSE 0.82 END
@@ -196,10 +202,11 @@ final_yields AS (
 ),
 filtered_parcels AS (
     SELECT
-        center_geom, area_sqft, parcels_combined, zone_class, neighborhood_name, prop_address,
+        prop_id, center_geom, area_sqft, parcels_combined, zone_class, neighborhood_name, prop_address,
         condo_price_per_sqft, acq_cost as acquisition_cost, existing_units, building_age, existing_sqft,
         final_cap_curr as current_capacity, final_cap_pritzker as pritzker_capacity, final_cap_sb79 as cap_true_sb79,
         primary_prop_class, tot_bldg_value, tot_land_value, market_correction_multiplier,
+        frontage_feet, depth_feet, is_corner, envelope_sqft,
         cpu_current, cpu_pritzker, cpu_sb79,
         rev_curr, rev_pritzker, rev_sb79,
         cost_curr, cost_pritzker, cost_sb79,
@@ -0,0 +1,39 @@
+-- One unified_properties-shaped row per candidate assembly in _assembly_sets, so 03_pro_forma.sql can evaluate it as if
+-- it were a single property. Combined the same way 02 combines the parcels at one address
+CREATE OR REPLACE TEMPORARY TABLE assembly_candidates AS
+WITH members AS (
+    SELECT candidate_id, component_id, UNNEST(members) as prop_id FROM _assembly_sets
+)
+SELECT
+    m.candidate_id as prop_id,
+    ANY_VALUE(m.component_id) as component_id,
+    ARG_MAX(up.center_geom, (up.area_sqft, -up.prop_id)) as center_geom,
+    ARG_MAX(up.neighborhood_name, (up.area_sqft, -up.prop_id)) as neighborhood_name,
+    ARG_MAX(up.zone_class, (up.area_sqft, -up.prop_id)) as zone_class,
+    SUM(up.area_sqft) as area_sqft,
+    SUM(up.parcels_combined) as parcels_combined,
+    SUM(COALESCE(up.envelope_sqft, up.area_sqft)) as envelope_sqft,
+    SUM(up.frontage_feet) as frontage_feet,
+    MAX(up.depth_feet) as depth_feet,
+    BOOL_OR(up.is_corner) as is_corner,
+
+    BOOL_OR(up.is_train_1320) as is_train_1320,
+    BOOL_OR(up.is_train_2640) as is_train_2640,
+    BOOL_OR(up.is_brt_1320) as is_brt_1320,
+    BOOL_OR(up.is_brt_2640) as is_brt_2640,
+    BOOL_OR(up.is_hf_1320) as is_hf_1320,
+    MAX(up.all_bus_count) as all_bus_count,
+    MAX(up.hf_bus_count) as hf_bus_count,
+
+    ARG_MAX(up.primary_prop_class, (up.tot_bldg_value + up.tot_land_value, -up.prop_id)) as primary_prop_class,
+    SUM(up.existing_units) as existing_units,
+    MAX(up.building_age) as building_age,
+    SUM(up.existing_sqft) as existing_sqft,
+    string_agg(up.prop_address, ' + ' ORDER BY up.prop_id) as prop_address,
+    SUM(up.tot_bldg_value) as tot_bldg_value,
+    SUM(up.tot_land_value) as tot_land_value,
+    ARG_MAX(up.market_correction_multiplier, (up.tot_bldg_value + up.tot_land_value, -up.prop_id)) as market_correction_multiplier,
+    list_sort(LIST(m.prop_id)) as members
+FROM members m
+JOIN unified_properties up ON m.prop_id = up.prop_id
+GROUP BY m.candidate_id;
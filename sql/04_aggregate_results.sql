@@ -15,7 +15,44 @@ SELECT
     SUM(area_sqft) as total_area_sqft,
     SUM(parcels_mf_zoned) as parcels_mf_zoned,
     SUM(area_mf_zoned) as area_mf_zoned,
-    ST_Y(ST_Centroid(ANY_VALUE(center_geom))) as label_lat,
-    ST_X(ST_Centroid(ANY_VALUE(center_geom))) as label_lon
+    ST_Y(ST_Centroid(ARG_MAX(center_geom, area_sqft))) as label_lat,
+    ST_X(ST_Centroid(ARG_MAX(center_geom, area_sqft))) as label_lon
 FROM step5_pro_forma
 GROUP BY neighborhood_name HAVING SUM(tot_true_sb79) > 0 OR SUM(tot_train_and_bus_combo) > 0;
+
+-- Per station/route rollup at each ring; a property counts toward every station whose ring reaches one of its parcels,
+-- so station totals overlap and don't sum to the citywide total
+CREATE OR REPLACE TABLE station_results AS
+WITH rings(ring) AS (VALUES (1320), (2640)),
+prop_station AS (
+    SELECT ps.kind, ps.station_id, ps.station_name, pp.prop_id, MIN(ps.distance) as distance, MIN(ps.ring) as ring
+    FROM parcel_station ps
+    JOIN property_parcels pp ON ps.pin10 = pp.pin10
+    WHERE ps.ring IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+)
+SELECT
+    s.kind,
+    s.station_id,
+    s.station_name,
+    r.ring,
+    COUNT(*) as properties,
+    SUM(p.parcels_combined) as total_parcels,
+    SUM(p.area_sqft) as total_area_sqft,
+    SUM(p.feasible_existing) as feasible_existing,
+    SUM(p.new_pritzker) as new_pritzker,
+    SUM(p.add_true_sb79) as add_true_sb79,
+    SUM(p.tot_true_sb79) as tot_true_sb79,
+    SUM(p.add_train_only) as add_train_only,
+    SUM(p.tot_train_only) as tot_train_only,
+    SUM(p.add_train_and_hf_bus) as add_train_and_hf_bus,
+    SUM(p.tot_train_and_hf_bus) as tot_train_and_hf_bus,
+    SUM(p.add_train_and_bus_combo) as add_train_and_bus_combo,
+    SUM(p.tot_train_and_bus_combo) as tot_train_and_bus_combo
+FROM prop_station s
+JOIN rings r ON s.ring <= r.ring
+JOIN step5_pro_forma p ON s.prop_id = p.prop_id
+GROUP BY 1, 2, 3, 4
+ORDER BY 1, 2, 4;
+
+CREATE INDEX station_results_name_idx ON station_results (station_name);
@@ -0,0 +1,36 @@
+import argparse
+import duckdb
+import yaml
+
+def load_config():
+    with open('config.yaml', 'r') as f:
+        return yaml.safe_load(f)
+
+COLUMNS = "kind, station_id, station_name, ring, properties, total_parcels, feasible_existing, new_pritzker, add_true_sb79, add_train_only, add_train_and_hf_bus, add_train_and_bus_combo"
+
+def station_report(station=None, kind='rail', ring=2640, top=25):
+    config = load_config()
+    con = duckdb.connect(config['database']['file_name'], read_only=True)
+    if station:
+        df = con.execute(f"SELECT {COLUMNS} FROM station_results WHERE station_name = ? ORDER BY kind, station_id, ring", [station]).df()
+    else:
+        df = con.execute(f"""
+            SELECT {COLUMNS} FROM station_results WHERE kind = ? AND ring = ?
+            ORDER BY add_true_sb79 DESC LIMIT ?
+        """, [kind, ring, top]).df()
+    con.close()
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Units unlocked per CTA station / BRT and high-frequency route catchment")
+    parser.add_argument('--station', help="Exact station name (e.g. Belmont); every line and ring for that name")
+    parser.add_argument('--kind', default='rail', choices=['rail', 'brt', 'hf'])
+    parser.add_argument('--ring', type=int, default=2640, choices=[1320, 2640])
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    df = station_report(args.station, args.kind, args.ring, args.top)
+    if df.empty:
+        print("No matching stations. Run python3 main.py --recalculate first, or check the station name.")
+    else:
+        print(df.to_string(index=False))
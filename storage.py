@@ -0,0 +1,261 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import duckdb
+import geography
+import resources
+import schemas
+import socrata
+
+# config['files'] key -> DuckDB table name
+TABLES = {
+    'chicago_zoning_geojson': 'zoning',
+    'cook_parcels_geojson': 'parcels',
+    'neighborhoods_geojson': 'neighborhoods',
+    'cta_stations_geojson': 'transit_stops',
+    'cta_bus_routes_geojson': 'bus_routes',
+    'chicago_parks_geojson': 'parks',
+    'schools_geojson': 'schools',
+    'assessor_universe_csv': 'assessor_universe',
+    'assessed_values_2023_csv': 'assessed_values',
+    'res_characteristics_csv': 'res_characteristics',
+    'parcel_addresses_csv': 'parcel_addresses',
+    'parcel_sales_csv': 'parcel_sales',
+    'building_permits_csv': 'building_permits',
+    'condo_characteristics_csv': 'condo_characteristics',
+    'municipalities_geojson': 'municipalities',
+}
+
+# generate_map.py still reads these as raw GeoJSON
+RAW_REQUIRED = {'neighborhoods_geojson', 'municipalities_geojson'}
+
+# Supplied by hand rather than downloaded; skipped quietly when absent
+OPTIONAL = {'schools_geojson'}
+
+def tables(config):
+    # The municipality layer is only needed, and usually only present, in county mode
+    return {key: table for key, table in TABLES.items()
+            if (key != 'municipalities_geojson' or geography.is_county(config))
+            and (key not in OPTIONAL or os.path.exists(config['files'].get(key, '')) or has_parquet(config, key))}
+
+def load_spatial(con):
+    # Only reach for the network when the extension isn't already installed (or restored from a bundle)
+    try:
+        con.execute("LOAD spatial")
+    except duckdb.Error:
+        con.execute("INSTALL spatial; LOAD spatial;")
+
+def parquet_path(config, table_name):
+    return os.path.join(config.get('storage', {}).get('parquet_dir', 'data/parquet'), f"{table_name}.parquet")
+
+def rejects_path(config, table_name):
+    return os.path.join(config.get('storage', {}).get('parquet_dir', 'data/parquet'), '_rejects', f"{table_name}.parquet")
+
+def source_mtime(filename):
+    if socrata.is_complete(filename):
+        return os.path.getmtime(os.path.join(socrata.chunk_dir(filename), '_SUCCESS'))
+    if os.path.exists(filename):
+        return os.path.getmtime(filename)
+    return None
+
+def clip_area(config, key):
+    # County mode loads every parcel in the county
+    if geography.is_county(config):
+        return None
+    return config.get('storage', {}).get('clip', {}).get(key)
+
+def clipped_with(dest):
+    # Parquet written before the clip was recorded counts as unclipped
+    try:
+        with open(dest + '.clip') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+def typed_with(dest, schema):
+    # Parquet written before its schema was recorded is taken as typed with the current one
+    if os.path.exists(dest) and not os.path.exists(dest + '.schema'):
+        with open(dest + '.schema', 'w') as f:
+            f.write(schema)
+    try:
+        with open(dest + '.schema') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+def clip_query(filename, area, batch_size, cell=0.01):
+    # Features are streamed from GDAL in batches. The study area is cut into cell-degree squares, and a feature lying in
+    # one cell is tested against that cell's small piece only; features spanning cells (or in a cell outside the area,
+    # which the hash join drops) are rare, and only those crossing cells are tested against the whole dissolved area.
+    # Every feature has one join key, so none can match twice
+    key = f"""CASE WHEN floor(ST_XMin(s.geom) / {cell}) = floor(ST_XMax(s.geom) / {cell})
+                    AND floor(ST_YMin(s.geom) / {cell}) = floor(ST_YMax(s.geom) / {cell})
+               THEN CAST(floor(ST_XMin(s.geom) / {cell}) * 100000 + floor(ST_YMin(s.geom) / {cell}) AS BIGINT) ELSE -1 END"""
+    return f"""
+        WITH study_area AS (SELECT ST_Union_Agg(geom) AS geom FROM ST_Read('{area}')),
+        cells AS (
+            SELECT CAST(x * 100000 + y AS BIGINT) AS cell,
+                   ST_MakeEnvelope(x * {cell}, y * {cell}, (x + 1) * {cell}, (y + 1) * {cell}) AS box
+            FROM study_area,
+                 range(CAST(floor(ST_XMin(geom) / {cell}) AS BIGINT), CAST(floor(ST_XMax(geom) / {cell}) AS BIGINT) + 1) xs(x),
+                 range(CAST(floor(ST_YMin(geom) / {cell}) AS BIGINT), CAST(floor(ST_YMax(geom) / {cell}) AS BIGINT) + 1) ys(y)
+        ),
+        pieces AS (
+            SELECT c.cell, ST_Intersection(a.geom, c.box) AS geom FROM cells c, study_area a WHERE ST_Intersects(a.geom, c.box)
+            UNION ALL
+            SELECT -1, geom FROM study_area
+        )
+        SELECT s.* FROM ST_Read('{filename}', max_batch_size={int(batch_size)}) s
+        JOIN pieces p ON p.cell = {key} AND ST_Intersects(s.geom, p.geom)
+    """
+
+def source_query(filename, rejects_table=None, clip=None, batch_size=2048, clip_cell=0.01):
+    if clip and not socrata.is_complete(filename):
+        return clip_query(filename, clip, batch_size, clip_cell)
+    if socrata.is_complete(filename):
+        return f"SELECT * FROM read_parquet('{socrata.parquet_glob(filename)}')"
+    if filename.endswith('.csv') and rejects_table:
+        # Read as text; typing happens in write_typed so bad values can be kept. Malformed lines land in rejects_table
+        return f"SELECT * FROM read_csv('{filename}', all_varchar=true, store_rejects=true, rejects_table='{rejects_table}', rejects_scan='{rejects_table}_scan')"
+    if filename.endswith('.csv'):
+        return f"SELECT * FROM read_csv_auto('{filename}', ignore_errors=true)"
+    return f"SELECT * FROM ST_Read('{filename}')"
+
+def write_typed(con, config, table_name, filename, dest, clip=None):
+    csv_rejects = f"_csv_rejects_{table_name}"
+    settings = config.get('storage', {})
+    query = source_query(filename, csv_rejects, clip, settings.get('batch_size', 2048), settings.get('clip_cell_degrees', 0.01))
+    # The typed output and the rejects are two passes over the source. Anything other than finished Parquet chunks is
+    # streamed once to a staging file on disk first, so the (clipped) source is neither read twice nor held in memory
+    staged = None
+    if socrata.is_complete(filename):
+        raw = f"({query})"
+    else:
+        staged = f"{dest}.raw.tmp"
+        con.execute(f"COPY ({query}) TO '{staged}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+        raw = f"read_parquet('{staged}')"
+    try:
+        described = con.execute(f"DESCRIBE SELECT * FROM {raw}").fetchall()
+        columns = [r[0] for r in described]
+        select, failed = schemas.typed_select(table_name, columns)
+        raw_row = ', '.join(f"'{r[0]}': CAST(\"{r[0]}\" AS VARCHAR)" for r in described if not r[1].startswith('GEOMETRY'))
+
+        con.execute(f"COPY (SELECT {select} FROM {raw} WHERE len({failed}) = 0) TO '{dest}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)")
+
+        rejects = [f"""
+            SELECT '{table_name}' AS table_name, {failed} AS failed_columns, to_json({{{raw_row}}})::VARCHAR AS raw_row
+            FROM {raw} WHERE len({failed}) > 0
+        """]
+        if con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [csv_rejects]).fetchone()[0]:
+            rejects.append(f"SELECT '{table_name}', [error_type], csv_line FROM {csv_rejects}")
+        out = rejects_path(config, table_name)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        con.execute(f"COPY ({' UNION ALL '.join(rejects)}) TO '{out}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    finally:
+        if staged and os.path.exists(staged):
+            os.remove(staged)
+        con.execute(f"DROP TABLE IF EXISTS {csv_rejects}")
+        con.execute(f"DROP TABLE IF EXISTS {csv_rejects}_scan")
+
+def load_query(source, columns, simplify_feet=10.0):
+    if 'geom' not in columns:
+        return f"SELECT * FROM read_parquet('{source}')"
+    # Reprojected to Illinois State Plane (feet) and repaired once here so spatial stages don't transform per query;
+    # the bbox columns let joins pre-filter on plain range predicates
+    return f"""
+        SELECT *,
+            ST_SimplifyPreserveTopology(geom_3435, {float(simplify_feet)}) AS geom_simple,
+            ST_XMin(geom_3435) AS xmin, ST_YMin(geom_3435) AS ymin,
+            ST_XMax(geom_3435) AS xmax, ST_YMax(geom_3435) AS ymax
+        FROM (
+            SELECT *, ST_MakeValid(ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true)) AS geom_3435
+            FROM read_parquet('{source}')
+        )
+    """
+
+# Layers the spatial stage cuts into tile windows. Only those constant-envelope probes use an RTREE index; DuckDB
+# plans joins between two tables as SPATIAL_JOIN over sequential scans whether or not one exists
+INDEXED = {'parcels', 'zoning', 'neighborhoods', 'municipalities', 'transit_stops', 'bus_routes'}
+
+def create_spatial_index(con, table_name, column='geom_3435'):
+    # CREATE OR REPLACE TABLE drops indexes, so this runs after every (re)load
+    con.execute(f"DROP INDEX IF EXISTS {table_name}_{column}_rtree")
+    con.execute(f"CREATE INDEX {table_name}_{column}_rtree ON {table_name} USING RTREE ({column})")
+
+def has_parquet(config, key):
+    return os.path.exists(parquet_path(config, TABLES[key])) if key in TABLES else False
+
+def missing_columns(con, filename, table_name):
+    columns = {r[0] for r in con.execute(f"DESCRIBE {source_query(filename)}").fetchall()}
+    return [c for c in schemas.SCHEMAS.get(table_name, {}) if c not in columns]
+
+def convert(con, config, key):
+    filename = config['files'][key]
+    dest = parquet_path(config, TABLES[key])
+    mtime = source_mtime(filename)
+    if mtime is None:
+        return dest if os.path.exists(dest) else None
+    clip = clip_area(config, key)
+    if clip and os.path.exists(clip):
+        mtime = max(mtime, os.path.getmtime(clip))
+    elif clip:
+        print(f"⚠️  Study area {clip} is missing; loading {filename} unclipped.")
+        clip = None
+    # The study area each parquet was clipped to and the schema it was typed with are kept beside it, so switching to
+    # county mode (or another clip) or editing schemas.py converts again even though the source is unchanged
+    clipped_to = clip or ''
+    schema = schemas.schema_hash(TABLES[key])
+    if (os.path.exists(dest) and os.path.getmtime(dest) >= mtime and clipped_with(dest) == clipped_to
+            and typed_with(dest, schema) == schema):
+        return dest
+
+    # A pruned download ($select in config.yaml) must still carry every column the SQL stages read
+    missing = missing_columns(con, filename, TABLES[key])
+    if missing:
+        raise ValueError(f"{filename} is missing required columns {missing}; check prune: in config.yaml")
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if clip:
+        print(f"   ✂️  Clipping {filename} to {clip} while loading...")
+    if TABLES[key] in schemas.SCHEMAS:
+        write_typed(con, config, TABLES[key], filename, dest, clip)
+    else:
+        # Geometry columns are written with GeoParquet metadata by the spatial extension
+        settings = config.get('storage', {})
+        query = source_query(filename, clip=clip, batch_size=settings.get('batch_size', 2048),
+                             clip_cell=settings.get('clip_cell_degrees', 0.01))
+        con.execute(f"COPY ({query}) TO '{dest}.tmp' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(dest + '.tmp', dest)
+    with open(dest + '.clip', 'w') as f:
+        f.write(clipped_to)
+    with open(dest + '.schema', 'w') as f:
+        f.write(schema)
+
+    if not config.get('storage', {}).get('keep_raw', True) and key not in RAW_REQUIRED and os.path.isfile(filename):
+        os.remove(filename)
+    return dest
+
+def convert_worker(config, key, threads):
+    t0 = time.time()
+    con = duckdb.connect()
+    try:
+        load_spatial(con)
+        con.execute(f"SET threads = {threads}")
+        resources.configure(con, config, config.get('storage', {}).get('max_workers', 4), f"load/{key}")
+        con.execute("SET preserve_insertion_order = false")
+        return {'key': key, 'source': convert(con, config, key), 'seconds': time.time() - t0}
+    except Exception as e:
+        return {'key': key, 'error': str(e), 'seconds': time.time() - t0}
+    finally:
+        con.close()
+
+def convert_all(config, keys=None):
+    # Each table is converted on its own in-memory connection; threads are split so workers don't oversubscribe the CPU
+    workers = config.get('storage', {}).get('max_workers', 4)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(convert_worker, config, key, threads) for key in (tables(config) if keys is None else keys)]
+            return {r['key']: r for r in (f.result() for f in as_completed(futures))}
+    finally:
+        resources.clear_temp(config, 'load')
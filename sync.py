@@ -0,0 +1,124 @@
+import os
+import shutil
+import time
+import duckdb
+import schemas
+import socrata
+import storage
+
+SYSTEM_FIELDS = (':id', ':created_at', ':updated_at')
+
+def ensure_state_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _sync_state (
+            table_name VARCHAR PRIMARY KEY,
+            watermark_column VARCHAR,
+            watermark VARCHAR,
+            rows_synced BIGINT,
+            synced_at TIMESTAMP
+        )
+    """)
+
+def reset_watermark(con, table_name):
+    ensure_state_table(con)
+    con.execute("DELETE FROM _sync_state WHERE table_name = ?", [table_name])
+
+def current_watermark(con, table_name, column):
+    row = con.execute("SELECT watermark FROM _sync_state WHERE table_name = ? AND watermark_column = ?", [table_name, column]).fetchone()
+    if row:
+        return row[0]
+    if column.startswith(':'):
+        return None
+    # First sync after a full load: start from the newest row already in the table
+    return con.execute(f"""
+        SELECT strftime(MAX(TRY_CAST({column} AS TIMESTAMP)), '%Y-%m-%dT%H:%M:%S')
+        FROM {table_name}
+    """).fetchone()[0]
+
+def table_columns(con, table_name):
+    return [r[0] for r in con.execute(f"DESCRIBE {table_name}").fetchall()]
+
+def sync_dataset(con, config, key, spec):
+    table_name = spec['table']
+    column = spec['watermark']
+    keys = spec['key']
+    filename = config['files'][key]
+
+    if table_name not in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        print(f"⚠️  Skipping '{table_name}': run a full download first.")
+        return
+    watermark = current_watermark(con, table_name, column)
+    if watermark is None:
+        print(f"⚠️  Skipping '{table_name}': no {column} watermark yet, run a full download first.")
+        return
+
+    t0 = time.time()
+    # Re-read a lookback window so late-recorded rows and corrections are picked up; the upsert makes this idempotent
+    since = f"date_add('{watermark}'::TIMESTAMP, -INTERVAL {int(spec.get('lookback_days', 0))} DAY)"
+    since_value = con.execute(f"SELECT strftime({since}, '%Y-%m-%dT%H:%M:%S')").fetchone()[0]
+    select = ':*, *' if column.startswith(':') else None
+    url = socrata.add_where(config['urls'][key], f"{column} >= '{since_value}'", select=select)
+
+    delta_file = os.path.join(os.path.dirname(filename), '_sync', os.path.basename(filename))
+    delta_dir = socrata.chunk_dir(delta_file)
+    shutil.rmtree(delta_dir, ignore_errors=True)
+    settings = {**config.get('download', {}), **config.get('socrata', {})}
+    result = socrata.fetch_dataset(delta_file, url, settings)
+    if 'error' in result:
+        return
+
+    rows = result.get('rows', 0)
+    rejected = 0
+    new_watermark = watermark
+    if rows:
+        con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _sync_delta AS SELECT * FROM read_parquet('{socrata.parquet_glob(delta_file)}')")
+        new_watermark = con.execute(f"""
+            SELECT strftime(MAX(TRY_CAST("{column}" AS TIMESTAMP)), '%Y-%m-%dT%H:%M:%S') FROM _sync_delta
+        """).fetchone()[0] or watermark
+
+        # Typed exactly as a full load types it: rows with a value that doesn't parse go to _rejects (as the latest sync's
+        # rejects for the table) and leave the row they'd have replaced untouched
+        described = con.execute("DESCRIBE _sync_delta").fetchall()
+        select, failed = schemas.typed_select(table_name, [r[0] for r in described])
+        raw_row = ', '.join(f"'{r[0]}': CAST(\"{r[0]}\" AS VARCHAR)" for r in described)
+        con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _sync_typed AS SELECT {select} FROM _sync_delta WHERE len({failed}) = 0")
+        out = storage.rejects_path(config, f"{table_name}_sync")
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        con.execute(f"""
+            COPY (
+                SELECT '{table_name}' AS table_name, {failed} AS failed_columns, to_json({{{raw_row}}})::VARCHAR AS raw_row
+                FROM _sync_delta WHERE len({failed}) > 0
+            ) TO '{out}' (FORMAT PARQUET, COMPRESSION ZSTD)
+        """)
+        rejected = rows - con.execute("SELECT COUNT(*) FROM _sync_typed").fetchone()[0]
+
+        typed_columns = set(table_columns(con, '_sync_typed'))
+        shared = ', '.join(f'"{c}"' for c in table_columns(con, table_name) if c in typed_columns and c not in SYSTEM_FIELDS)
+        key_match = ' AND '.join(f"t.{k} = d.{k}" for k in keys)
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(f"DELETE FROM {table_name} t USING _sync_typed d WHERE {key_match}")
+            con.execute(f"INSERT INTO {table_name} ({shared}) SELECT {shared} FROM _sync_typed")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("DROP TABLE _sync_typed")
+        con.execute("DROP TABLE _sync_delta")
+    shutil.rmtree(delta_dir, ignore_errors=True)
+
+    con.execute("""
+        INSERT OR REPLACE INTO _sync_state VALUES (?, ?, ?, ?, now()::TIMESTAMP)
+    """, [table_name, column, new_watermark, rows])
+    print(f"   ✅ Synced '{table_name}': {rows:,} rows since {since_value}, watermark now {new_watermark} ({time.time() - t0:.1f}s)"
+          + (f"; {rejected:,} unparseable rows written to {out}" if rejected else ""))
+
+def sync_all(config):
+    print("\n🔄 Incremental sync...")
+    con = duckdb.connect(config['database']['file_name'])
+    ensure_state_table(con)
+    try:
+        for key, spec in config.get('sync', {}).items():
+            sync_dataset(con, config, key, spec)
+    finally:
+        con.close()
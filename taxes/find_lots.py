@@ -16,8 +16,17 @@ def find_neighbor_owned_empty_lots():
 
     con = duckdb.connect(db_file)
 
-    # Load the spatial extension so ST_DWithin and ST_Distance work
-    con.execute("INSTALL spatial; LOAD spatial;")
+    # Load the spatial extension so ST_DWithin and ST_Distance work; only install when it isn't there yet
+    try:
+        con.execute("LOAD spatial;")
+    except duckdb.Error:
+        con.execute("INSTALL spatial; LOAD spatial;")
+
+    # Park distances are precomputed for every parcel during setup
+    if 'parcel_amenity_distance' not in [r[0] for r in con.execute("SHOW TABLES").fetchall()]:
+        print("❌ parcel_amenity_distance is missing. Run 'python3 amenities.py' from the project root first.")
+        con.close()
+        return
 
     query = """
             WITH target_nbhds AS (
@@ -30,7 +39,7 @@ def find_neighbor_owned_empty_lots():
                 sales_info AS (
             -- Get the most recent buyer if a purchase happened recently
             SELECT
-                SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10,
+                pin10,
                 ANY_VALUE(buyer_name) as buyer_name
             FROM parcel_sales
             WHERE buyer_name IS NOT NULL AND TRIM(buyer_name) != ''
@@ -39,7 +48,7 @@ def find_neighbor_owned_empty_lots():
                 owner_info AS (
             -- Get the official mailing taxpayer name and property address
             SELECT
-                SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10,
+                pin10,
                 ANY_VALUE(mail_address_name) as mail_name,
                 ANY_VALUE(prop_address_full) as prop_address
             FROM parcel_addresses
@@ -61,10 +70,10 @@ def find_neighbor_owned_empty_lots():
                 (COALESCE(v.land_value, 0.0) / 0.10) as est_land_value
             FROM target_nbhds tn
                 LEFT JOIN (
-                SELECT SUBSTR(LPAD(CAST(pin AS VARCHAR), 14, '0'), 1, 10) as pin10,
-                SUM(TRY_CAST(certified_bldg AS DOUBLE)) as bldg_value,
-                SUM(TRY_CAST(certified_land AS DOUBLE)) as land_value,
-                ANY_VALUE(CAST("class" AS VARCHAR)) as property_class
+                SELECT pin10,
+                SUM(certified_bldg) as bldg_value,
+                SUM(certified_land) as land_value,
+                ANY_VALUE("class") as property_class
                 FROM assessed_values
                 GROUP BY 1
                 ) v ON tn.pin10 = v.pin10
@@ -87,19 +96,6 @@ def find_neighbor_owned_empty_lots():
             SELECT * FROM parcel_values
             WHERE (est_bldg_value + est_land_value) >= 500000
               AND est_bldg_value >= 50000
-                ),
-                nearest_park AS (
-            -- Calculate the shortest straight-line distance to any Chicago park
-            SELECT
-                e.pin10,
-                MIN(ST_Distance(e.geom_3435, p.geom_3435)) as dist_to_park
-            FROM empty_lots e
-                CROSS JOIN (
-                SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) as geom_3435
-                FROM parks
-                WHERE geom IS NOT NULL
-                ) p
-            GROUP BY 1
                 ),
                 matched_lots AS (
             SELECT DISTINCT
@@ -114,13 +110,13 @@ def find_neighbor_owned_empty_lots():
                 b.area_sqft AS neighbor_area,
                 -- Expected tax is the neighbor's tax scaled by the ratio of the lot sizes
                 ((b.est_bldg_value + b.est_land_value) * 0.018) * (e.area_sqft / NULLIF(b.area_sqft, 0)) AS expected_proportional_tax,
-                np.dist_to_park
+                np.park_feet AS dist_to_park
             FROM empty_lots e
                 JOIN built_lots b
             ON ST_DWithin(e.geom_3435, b.geom_3435, 5) -- 5 foot tolerance to catch adjacent PINs
                 AND e.pin10 != b.pin10
                 AND e.owner_name = b.owner_name
-                LEFT JOIN nearest_park np ON e.pin10 = np.pin10
+                LEFT JOIN parcel_amenity_distance np ON e.pin10 = np.pin10
                 )
             SELECT
                 "Neighborhood",
@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import download
+
+BODY = bytes(range(256)) * 4096  # 1 MB
+SETTINGS = {'retries': 3, 'backoff_seconds': 0, 'chunk_size': 65536, 'timeout': 10}
+
+class StandIn(BaseHTTPRequestHandler):
+    # Serves BODY with Range support; while server.truncate is set, a full response stops half way through
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(BODY):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(BODY)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(BODY) - start))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        if self.server.truncate and not start:
+            self.server.truncate -= 1
+            self.wfile.write(BODY[:len(BODY) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(BODY[start:])
+
+    def log_message(self, *args):
+        pass
+
+class DownloadFileTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        self.server.requests, self.server.truncate = [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data.geojson"
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'data.geojson')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.file, 'rb') as f:
+            return f.read()
+
+    def test_truncated_response_is_resumed(self):
+        self.server.truncate = 1
+        result = download.download_file(self.file, self.url, SETTINGS)
+        self.assertNotIn('error', result)
+        self.assertEqual(self.read(), BODY)
+        self.assertEqual(self.server.requests, [None, f"bytes={len(BODY) // 2}-"])
+        self.assertTrue(download.is_complete(self.file))
+
+    def test_truncated_file_without_marker_is_completed(self):
+        # As left by the old downloader, which wrote straight to the destination
+        with open(self.file, 'wb') as f:
+            f.write(BODY[:1000])
+        result = download.download_file(self.file, self.url, SETTINGS)
+        self.assertNotIn('skipped', result)
+        self.assertEqual(self.read(), BODY)
+        self.assertEqual(self.server.requests, ["bytes=1000-"])
+
+    def test_whole_file_without_marker_is_kept(self):
+        with open(self.file, 'wb') as f:
+            f.write(BODY)
+        download.download_file(self.file, self.url, SETTINGS)
+        self.assertEqual(self.read(), BODY)
+        self.assertEqual(self.server.requests, [f"bytes={len(BODY)}-"])
+        self.assertTrue(download.is_complete(self.file))
+
+    def test_completed_file_is_skipped(self):
+        download.download_file(self.file, self.url, SETTINGS)
+        result = download.download_file(self.file, self.url, SETTINGS)
+        self.assertTrue(result.get('skipped'))
+        self.assertEqual(self.server.requests, [None])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import math
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import walk_network
+
+RAIL, BRT, HF = range(3)
+
+def graph(edges):
+    u, v, feet = zip(*edges)
+    return np.array(u), np.array(v), np.array(feet, dtype=float)
+
+class WalkDistancesTest(unittest.TestCase):
+    # 0 - 1 - 2 - 3 is a street with two bends; 3 is a junction to 4, to 5 - 6, and round the loop 3 - 7 - 8 - 3
+    EDGES = [(0, 1, 10), (1, 2, 10), (2, 3, 10), (3, 4, 10), (3, 5, 10), (5, 6, 10), (3, 7, 5), (7, 8, 5), (8, 3, 5)]
+
+    def test_distances_through_collapsed_vertices(self):
+        u, v, feet = graph(self.EDGES)
+        sources = [(RAIL, 0, 2.0), (HF, 6, 0.0)]
+        rail, brt, hf = walk_network.walk_distances(9, u, v, feet, sources, 45)
+        inf = math.inf
+        self.assertEqual(rail.tolist(), [2, 12, 22, 32, 42, 42, inf, 37, 37])
+        self.assertEqual(hf.tolist(), [inf, 40, 30, 20, 30, 10, 0, 25, 25])
+        self.assertTrue(np.isinf(brt).all())
+
+    def test_bends_are_collapsed(self):
+        u, v, feet = graph(self.EDGES)
+        keep = np.zeros(9, dtype=bool)
+        keep[6] = True
+        cu, cv, cfeet, kept, _, _ = walk_network.collapse_chains(9, u, v, feet, keep)
+        self.assertEqual(np.flatnonzero(kept).tolist(), [0, 3, 4, 6])
+        # 0-3, 3-4 and 3-6 in both directions; the loop through 7 and 8 leads nowhere and is dropped
+        self.assertEqual(sorted(zip(cu.tolist(), cv.tolist(), cfeet.tolist())),
+                         [(0, 3, 30), (3, 0, 30), (3, 4, 10), (3, 6, 20), (4, 3, 10), (6, 3, 20)])
+
+    def test_parallel_runs_keep_the_shorter(self):
+        # Two ways from 0 to 2: round by 1 (20 ft) or by 3 (2 ft)
+        u, v, feet = graph([(0, 1, 10), (1, 2, 10), (0, 3, 1), (3, 2, 1)])
+        rail, _, _ = walk_network.walk_distances(4, u, v, feet, [(RAIL, 0, 0.0), (RAIL, 2, 5.0)], 100)
+        self.assertEqual(rail.tolist(), [0, 10, 2, 1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+import manifest
+
+CATEGORIES = ['rail', 'brt', 'hf']
+
+def settings(config):
+    return config.get('walk_network', {})
+
+def is_enabled(config):
+    return bool(settings(config).get('enabled'))
+
+def load_network(con, config, force=False):
+    s = settings(config)
+    path = s['file']
+    fp = manifest.file_fingerprint(con, 'walk_edges', path, [path])
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if not force and manifest.is_current(con, 'walk_edges', fp) and 'walk_nodes' in tables:
+        manifest.touch(con, 'walk_edges', fp)
+        print(f"⏭️  Walking network unchanged ({path})")
+        return
+
+    t0 = time.time()
+    print(f"⏳ Loading walking network from {path}...", end="", flush=True)
+    layer = f", layer='{s['layer']}'" if s.get('layer') else ""
+    where = f"WHERE {s['where']}" if s.get('where') else ""
+    # Vertices are snapped to a 1 ft grid so ways meeting at a shared node become one graph node; ways that only
+    # cross (bridges, underpasses) share no vertex and stay unconnected
+    con.execute(f"""
+        CREATE OR REPLACE TEMPORARY TABLE _walk_segments AS
+        WITH src AS (
+            SELECT ST_Transform(geom, 'EPSG:4326', 'EPSG:3435', true) AS geom FROM ST_Read('{path}'{layer}) {where}
+        ),
+        parts AS (SELECT UNNEST(ST_Dump(geom)).geom AS geom FROM src),
+        lines AS (SELECT geom, UNNEST(generate_series(1, ST_NPoints(geom) - 1)) AS i FROM parts WHERE ST_GeometryType(geom) = 'LINESTRING'),
+        segs AS (SELECT ST_PointN(geom, CAST(i AS INTEGER)) AS a, ST_PointN(geom, CAST(i + 1 AS INTEGER)) AS b FROM lines)
+        SELECT round(ST_X(a)) AS x1, round(ST_Y(a)) AS y1, round(ST_X(b)) AS x2, round(ST_Y(b)) AS y2, ST_Distance(a, b) AS feet
+        FROM segs
+    """)
+    con.execute("""
+        CREATE OR REPLACE TABLE walk_nodes AS
+        SELECT CAST(row_number() OVER (ORDER BY x, y) - 1 AS INTEGER) AS node_id, x, y, ST_Point(x, y) AS geom_3435
+        FROM (SELECT x1 AS x, y1 AS y FROM _walk_segments UNION SELECT x2, y2 FROM _walk_segments)
+    """)
+    con.execute("""
+        CREATE OR REPLACE TABLE walk_edges AS
+        SELECT na.node_id AS u, nb.node_id AS v, MIN(s.feet) AS feet
+        FROM _walk_segments s
+        JOIN walk_nodes na ON s.x1 = na.x AND s.y1 = na.y
+        JOIN walk_nodes nb ON s.x2 = nb.x AND s.y2 = nb.y
+        WHERE na.node_id != nb.node_id
+        GROUP BY 1, 2
+    """)
+    con.execute("DROP TABLE _walk_segments")
+    con.execute("CREATE INDEX walk_nodes_geom_3435_rtree ON walk_nodes USING RTREE (geom_3435)")
+    edges = con.execute("SELECT COUNT(*) FROM walk_edges").fetchone()[0]
+    manifest.record(con, 'walk_edges', fp, edges)
+    nodes = con.execute("SELECT COUNT(*) FROM walk_nodes").fetchone()[0]
+    print(f" ✅ ({nodes:,} nodes, {edges:,} edges in {time.time() - t0:.1f}s)")
+
+def build_csr(n, u, v, feet):
+    # Undirected: every edge is stored once per direction, grouped by origin node
+    src = np.concatenate([u, v])
+    dst = np.concatenate([v, u])
+    weights = np.concatenate([feet, feet])
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order], weights[order]
+
+def collapse_chains(n, u, v, feet, keep):
+    # A vertex with exactly two neighbours is only a bend in the street. Every run of them between two junctions (or
+    # kept nodes) becomes one edge, walked once from each end so a collapsed vertex learns its distance to both
+    u, v = np.minimum(u, v), np.maximum(u, v)
+    undirected = pd.DataFrame({'u': u, 'v': v, 'feet': feet}).groupby(['u', 'v'], as_index=False)['feet'].min()
+    indptr, indices, weights = build_csr(n, undirected['u'].to_numpy(), undirected['v'].to_numpy(), undirected['feet'].to_numpy())
+    kept = keep | (np.diff(indptr) != 2)
+    indptr, indices, weights, is_kept = indptr.tolist(), indices.tolist(), weights.tolist(), kept.tolist()
+    ends = [[0] * n, [0] * n]
+    offsets = [[float('inf')] * n, [float('inf')] * n]
+    cu, cv, cfeet = [], [], []
+    for start in np.flatnonzero(kept).tolist():
+        for k in range(indptr[start], indptr[start + 1]):
+            prev, node, total = start, indices[k], weights[k]
+            while not is_kept[node]:
+                side = 0 if offsets[0][node] == float('inf') else 1
+                ends[side][node], offsets[side][node] = start, total
+                j = indptr[node] + (indices[indptr[node]] == prev)
+                prev, node, total = node, indices[j], total + weights[j]
+            if node != start:
+                cu.append(start)
+                cv.append(node)
+                cfeet.append(total)
+    return np.array(cu, dtype=np.int64), np.array(cv, dtype=np.int64), np.array(cfeet), kept, np.array(ends), np.array(offsets)
+
+def walk_distances(n, u, v, feet, sources, cutoff):
+    # Distance from every node to the nearest source of each category, walking at most cutoff. Sources start at their
+    # snap distance, so each category gets a virtual origin (node n) linked to its source nodes by that distance
+    keep = np.zeros(n, dtype=bool)
+    keep[[node for _, node, _ in sources]] = True
+    cu, cv, cfeet, kept, ends, offsets = collapse_chains(n, np.asarray(u), np.asarray(v), np.asarray(feet), keep)
+    dist = []
+    for cat in range(len(CATEGORIES)):
+        links = [(node, d) for c, node, d in sources if c == cat]
+        # Parallel runs between the same two junctions (and repeated links) keep their shortest; csr_matrix would sum them
+        edges = pd.DataFrame({
+            'u': np.concatenate([cu, np.full(len(links), n, dtype=np.int64)]),
+            'v': np.concatenate([cv, np.array([node for node, _ in links], dtype=np.int64)]),
+            'feet': np.concatenate([cfeet, np.array([d for _, d in links], dtype=float)]),
+        }).groupby(['u', 'v'], as_index=False)['feet'].min()
+        graph = csr_matrix((edges['feet'].to_numpy(), (edges['u'].to_numpy(), edges['v'].to_numpy())), shape=(n + 1, n + 1))
+        d = dijkstra(graph, directed=True, indices=[n], min_only=True, limit=cutoff)[:n]
+        d = np.where(kept, d, np.minimum(d[ends[0]] + offsets[0], d[ends[1]] + offsets[1]))
+        d[d > cutoff] = np.inf
+        dist.append(d)
+    return dist
+
+def source_nodes(con, snap):
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    points = "SELECT 0 AS category, geom_3435 AS geom FROM transit_stops WHERE geom_3435 IS NOT NULL"
+    routes = "SELECT CAST(route AS VARCHAR) AS route, geom_3435 AS geom FROM bus_routes WHERE geom_3435 IS NOT NULL"
+    # Bus access points are the GTFS stops of BRT and high-frequency routes
+    has_stops = 'gtfs_stop_frequency' in tables and 'gtfs_stops' in tables
+    if has_stops:
+        routes = """
+            SELECT DISTINCT CAST(f.route AS VARCHAR) AS route,
+                   ST_Transform(ST_Point(CAST(s.stop_lon AS DOUBLE), CAST(s.stop_lat AS DOUBLE)), 'EPSG:4326', 'EPSG:3435', true) AS geom
+            FROM gtfs_stop_frequency f JOIN gtfs_stops s ON f.stop_id = s.stop_id
+        """
+    by_category = f"""
+        WITH r AS ({routes})
+        SELECT 1 AS category, geom FROM r WHERE route = 'J14'
+        UNION ALL SELECT 2, geom FROM r WHERE route IN (SELECT route FROM hf_routes)
+    """
+    # Stations and stops join the graph at their nearest node within snap_feet, walked in a straight line
+    nearest = points + (f" UNION ALL {by_category}" if has_stops else "")
+    rows = con.execute(f"""
+        WITH s AS (SELECT row_number() OVER () AS source_id, * FROM ({nearest}))
+        SELECT s.category, ARG_MIN(n.node_id, ST_Distance(s.geom, n.geom_3435)), MIN(ST_Distance(s.geom, n.geom_3435))
+        FROM s JOIN walk_nodes n ON ST_DWithin(s.geom, n.geom_3435, {snap})
+        GROUP BY s.source_id, s.category
+    """).fetchall()
+    if not has_stops:
+        # Without a feed the route can be boarded anywhere along its line, as the straight-line distances assume
+        rows += con.execute(f"""
+            SELECT s.category, n.node_id, MIN(ST_Distance(s.geom, n.geom_3435))
+            FROM ({by_category}) s JOIN walk_nodes n ON ST_DWithin(s.geom, n.geom_3435, {snap})
+            GROUP BY 1, 2
+        """).fetchall()
+    return rows
+
+def distances_version(con, config):
+    s = settings(config)
+    hashes = con.execute("""
+        SELECT string_agg(table_name || ':' || file_hash, ',' ORDER BY table_name) FROM _manifest
+        WHERE table_name IN ('walk_edges', 'parcels', 'transit_stops', 'bus_routes', 'gtfs_stop_times')
+    """).fetchone()[0]
+    hf = con.execute("SELECT string_agg(route, ',' ORDER BY route) FROM hf_routes").fetchone()[0]
+    radius = config.get('transit', {}).get('max_radius_feet', 2640)
+    return hashlib.sha256(f"{hashes}|{hf}|{s.get('snap_feet', 300)}|{radius}".encode()).hexdigest()[:16]
+
+def build_walk_distances(con, config):
+    version = distances_version(con, config)
+    tables = [r[0] for r in con.execute("SHOW TABLES").fetchall()]
+    if 'parcel_walk_distance' in tables and con.execute(
+            "SELECT COUNT(*) FROM parcel_walk_distance WHERE version = ?", [version]).fetchone()[0]:
+        print(f"⏭️  Walking distances unchanged (version {version})")
+        return
+
+    t0 = time.time()
+    print("⏳ Routing walking distances from stations and HF stops...", end="", flush=True)
+    snap = float(settings(config).get('snap_feet', 300))
+    cutoff = float(config.get('transit', {}).get('max_radius_feet', 2640))
+
+    edges = con.execute("SELECT u, v, feet FROM walk_edges").fetchnumpy()
+    n = con.execute("SELECT COUNT(*) FROM walk_nodes").fetchone()[0]
+    dist = walk_distances(n, edges['u'], edges['v'], edges['feet'], source_nodes(con, snap), cutoff)
+
+    node_dist = pd.DataFrame({'node_id': np.arange(n, dtype=np.int32),
+                              **{cat: dist[i] for i, cat in enumerate(CATEGORIES)}})
+    con.register('_walk_node_distance', node_dist)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE parcel_walk_distance AS
+        WITH snapped AS (
+            -- A parcel joins the graph at its nearest node only, so it can't reach a station across a barrier by snapping over it
+            SELECT p.pin10, ARG_MIN(n.node_id, ST_Distance(p.geom_3435, n.geom_3435)) AS node_id,
+                   MIN(ST_Distance(p.geom_3435, n.geom_3435)) AS snap_feet
+            FROM parcels p JOIN walk_nodes n ON ST_DWithin(p.geom_3435, n.geom_3435, {snap})
+            WHERE p.geom_3435 IS NOT NULL
+            GROUP BY 1
+        )
+        SELECT s.pin10,
+               {', '.join(f"CASE WHEN d.{c} + s.snap_feet <= {cutoff} THEN d.{c} + s.snap_feet END AS {c}_walk" for c in CATEGORIES)},
+               '{version}' AS version
+        FROM snapped s JOIN _walk_node_distance d ON s.node_id = d.node_id
+    """)
+    con.unregister('_walk_node_distance')
+    reached = con.execute("SELECT COUNT(*), COUNT(rail_walk), COUNT(hf_walk) FROM parcel_walk_distance").fetchone()
+    print(f" ✅ ({reached[0]:,} parcels on the network, {reached[1]:,} within walking range of rail, {reached[2]:,} of HF bus, {time.time() - t0:.1f}s)")
+
+def setup_walk_network(con, config):
+    if not is_enabled(config):
+        return
+    path = settings(config).get('file')
+    if not path or not os.path.exists(path):
+        print(f"⚠️  walk_network is enabled but {path} is missing; using straight-line distances")
+        con.execute("DROP TABLE IF EXISTS parcel_walk_distance")
+        return
+    load_network(con, config)
+    build_walk_distances(con, config)